@@ -0,0 +1,62 @@
+"""
+Precomputed answer index for Tiki Taka Toe
+Maps each (club, country) grid cell's accepted guess strings to the player
+they identify
+"""
+
+import unicodedata
+
+
+def normalize_name(name):
+    """Accent- and case-fold a player name or guess so equivalent spellings compare equal"""
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.casefold().split())
+
+
+def surname_form(name):
+    """Everything but the first word of a name (the name itself if it is one word)"""
+    parts = name.strip().split()
+    return " ".join(parts[1:]) if len(parts) > 1 else name.strip()
+
+
+def build_cell_table(store, rows):
+    """Build a {normalized guess: player row} table for one cell's candidate rows.
+
+    Each candidate is reachable by its full name and by its surname form. When
+    two candidates share a key the one listed first wins, matching the order
+    the old row-by-row scan accepted guesses in.
+    """
+    table = {}
+    for row in rows:
+        name = store.name_at(row)
+        table.setdefault(normalize_name(name), row)
+        table.setdefault(normalize_name(surname_form(name)), row)
+    return table
+
+
+class NameIndex:
+    """Per-cell normalized-guess lookup over a PlayerStore.
+
+    Cell tables are built the first time a cell is probed and cached, so
+    startup costs nothing and only cells that appear in grids take memory.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._tables = {}
+
+    def table_for(self, club, country):
+        """Return the cell's {normalized guess: player row} table"""
+        table = self._tables.get((club, country))
+        if table is None:
+            table = build_cell_table(self.store, self.store.cell_rows_for(club, country))
+            self._tables[(club, country)] = table
+        return table
+
+    def match(self, club, country, guess):
+        """Return (player_id, name) for a guess that answers the cell, or None"""
+        row = self.table_for(club, country).get(normalize_name(guess))
+        if row is None:
+            return None
+        return self.store.player_ids[row], self.store.name_at(row)
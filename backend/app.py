@@ -5,30 +5,48 @@ except ImportError:
     # Fallback for environments where flask_cors might not be available
     print("Warning: flask_cors not available, CORS will be disabled")
     CORS = lambda app: None
-import pandas as pd
+import atexit
 import random
 import os
 from dotenv import load_dotenv
+import time
 from datetime import datetime
-from data.valid_pairs import VALID_PAIRS
-from difficulty import easy_clubs, medium_clubs, hard_clubs, easy_countries, medium_countries, hard_countries
-from models import db, User, GameStats, UserSession
-from auth import require_auth, register_user, authenticate_user, logout_user, get_user_stats
+from difficulty import DIFFICULTY_POOLS
+from models import db, User, GameStats, UserSession, UserStatsSummary
+from password_hasher import password_hasher
+from auth import require_auth, register_user, authenticate_user, logout_user, get_user_stats, session_cache, revoked_tokens
+from answer_index import NameIndex
+from grid_generator import GridGenerator
+from grid_pool import GridPool
+from game_store import MemoryGameStore, create_game_store
+from game_journal import GameJournal, EVENT_CREATED, EVENT_GUESS, EVENT_HINT, EVENT_RESET, EVENT_EVICTED
+from game_state import GameState, MAX_HINT_COUNT, MAX_USER_ID
+from stats_writer import StatsWriter
+from session_sweeper import SessionSweeper
+from stats_rollup import apply_rollup
+from migrations import run_migrations
+from leaderboard import Leaderboards, ALL_DIFFICULTIES, WINDOWS
+from image_search import ImageCache, ImageSearch, SEARCH_VARIANTS
+from http_client import HTTPClient
+from snapshot import load_player_store
 
 import requests
 from io import BytesIO
 from typing import Dict, List, Optional, Tuple, Any
-from sqlalchemy import text
+from sqlalchemy import text, insert, func, select
+
+DEFAULT_SECRET_KEY = 'dev-secret-key-change-in-production'
 
 def create_app():
     """Application factory function"""
     app = Flask(__name__)
     
-    # Configuration
-    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
     # Load environment variables from a .env file if present (local dev convenience)
     load_dotenv()
 
+    # Configuration
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', DEFAULT_SECRET_KEY)
+
     # Database URL with sensible default for local dev
     database_url = os.environ.get('DATABASE_URL', 'sqlite:///tiki_taka_toe.db')
     # Normalize old postgres URLs if present (Railway/Heroku style)
@@ -36,6 +54,12 @@ def create_app():
         database_url = database_url.replace('postgres://', 'postgresql+psycopg2://', 1)
     app.config['SQLALCHEMY_DATABASE_URI'] = database_url
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    # 'session' stores random tokens in user_sessions; 'signed' issues stateless signed tokens
+    app.config['AUTH_TOKEN_MODE'] = os.environ.get('AUTH_TOKEN_MODE', 'session')
+    if app.config['AUTH_TOKEN_MODE'] == 'signed' and app.config['SECRET_KEY'] == DEFAULT_SECRET_KEY:
+        # Anyone can sign tokens with the published default key
+        raise RuntimeError("AUTH_TOKEN_MODE=signed requires SECRET_KEY to be set")
     
     # Initialize extensions
     db.init_app(app)
@@ -48,18 +72,174 @@ def create_app():
 # Create the app instance
 app = create_app()
 
+# === Session-token cache (0 disables it) ===
+AUTH_CACHE_SIZE = int(os.environ.get('AUTH_CACHE_SIZE', 10000))
+AUTH_CACHE_TTL = float(os.environ.get('AUTH_CACHE_TTL', 5))  # seconds; the longest a logout takes to reach other workers
+session_cache.configure(AUTH_CACHE_SIZE, AUTH_CACHE_TTL)
+
+# === Password hashing (bcrypt cost and how many hashes each worker runs at once) ===
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 12))
+BCRYPT_WORKERS = int(os.environ.get('BCRYPT_WORKERS', 1))
+BCRYPT_MAX_PENDING = int(os.environ.get('BCRYPT_MAX_PENDING', 4))  # keep below the gunicorn --threads count
+password_hasher.configure(BCRYPT_ROUNDS, BCRYPT_WORKERS, BCRYPT_MAX_PENDING)
+
+# How often each worker reloads revoked signed tokens (AUTH_TOKEN_MODE=signed)
+revoked_tokens.refresh_interval = float(os.environ.get('AUTH_REVOCATION_REFRESH', 30))  # seconds
+
 # === Load cleaned player data ===
 DATA_PATH = os.path.join("data", "cleaned_players.csv")
-df = pd.read_csv(DATA_PATH)
-
-# === Game state tracking ===
-active_games = {}
+SNAPSHOT_PATH = os.path.join("data", "players.snapshot")
+players = load_player_store(DATA_PATH, SNAPSHOT_PATH)
+
+# === Club x country validity bitsets for grid generation ===
+grid_generator = GridGenerator(players)
+
+# === Difficulty pools pruned to clubs and countries that can appear in a grid ===
+RESOLVED_POOLS = grid_generator.resolve_pools(DIFFICULTY_POOLS)
+
+# === Pre-generated grids per difficulty, refilled in the background ===
+GRID_POOL_SIZE = int(os.environ.get('GRID_POOL_SIZE', 50))
+GRID_POOL_LOW_WATERMARK = int(os.environ.get('GRID_POOL_LOW_WATERMARK', GRID_POOL_SIZE // 2))
+grid_pool = GridPool(grid_generator.generate, RESOLVED_POOLS,
+                     capacity=GRID_POOL_SIZE, low_watermark=GRID_POOL_LOW_WATERMARK)
+grid_pool.start()
+
+# === Per-cell guess lookup ===
+name_index = NameIndex(players)
+
+# === Game state tracking (memory, sqlite:///path or redis:// URL) ===
+GAME_STORE_MAX_GAMES = int(os.environ.get('GAME_STORE_MAX_GAMES', 10000))
+GAME_IDLE_TTL = int(os.environ.get('GAME_IDLE_TTL', 6 * 60 * 60))  # seconds
+FLUSH_ABANDONED_GAMES = os.environ.get('FLUSH_ABANDONED_GAMES', 'false').lower() == 'true'
+
+# === Write-behind queue for finished-game stats ===
+STATS_QUEUE_SIZE = int(os.environ.get('STATS_QUEUE_SIZE', 1000))
+STATS_BATCH_SIZE = int(os.environ.get('STATS_BATCH_SIZE', 100))
+STATS_FLUSH_INTERVAL = float(os.environ.get('STATS_FLUSH_INTERVAL', 1.0))  # seconds
+STATS_SPILL_PATH = os.environ.get('STATS_SPILL_PATH', os.path.join("data", "stats_spill.jsonl"))  # rows waiting out a database outage
+
+# === In-memory leaderboards, synced with the database every few seconds ===
+LEADERBOARD_SYNC_INTERVAL = float(os.environ.get('LEADERBOARD_SYNC_INTERVAL', 5))  # seconds
+LEADERBOARD_REBUILD_INTERVAL = float(os.environ.get('LEADERBOARD_REBUILD_INTERVAL', 300))  # seconds
+LEADERBOARD_SYNC_BATCH_SIZE = 5000  # new games read per sync
+leaderboards = Leaderboards(DIFFICULTY_POOLS, rebuild_interval=LEADERBOARD_REBUILD_INTERVAL,
+                            sync_interval=LEADERBOARD_SYNC_INTERVAL)
+
+def load_leaderboard_sources():
+    """Read all-time totals from the stats rollups and the last week's games for a leaderboard rebuild"""
+    with app.app_context():
+        # All three reads must see one snapshot, or a game committed in between is in the totals and synced again
+        dialect = db.session.get_bind().dialect.name
+        if dialect == "postgresql":
+            db.session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        elif dialect == "sqlite":
+            # pysqlite only opens a transaction before writes, so each SELECT would otherwise see the latest data
+            db.session.connection().exec_driver_sql("BEGIN")
+        last_id = db.session.query(func.max(GameStats.id)).scalar() or 0
+        totals = db.session.query(
+            UserStatsSummary.user_id, UserStatsSummary.difficulty, UserStatsSummary.total_score
+        ).all()
+        recent = db.session.query(
+            GameStats.user_id, GameStats.difficulty, GameStats.score, GameStats.played_at
+        ).filter(GameStats.played_at >= datetime.utcnow() - WINDOWS["week"], GameStats.id <= last_id
+                 ).order_by(GameStats.played_at).all()
+    return totals, recent, last_id
+
+def load_new_games(after_id):
+    """Read games saved by any worker since after_id for a leaderboard sync"""
+    with app.app_context():
+        return [dict(row) for row in db.session.execute(
+            select(GameStats.id, GameStats.user_id, GameStats.difficulty, GameStats.score, GameStats.played_at)
+            .where(GameStats.id > after_id).order_by(GameStats.id).limit(LEADERBOARD_SYNC_BATCH_SIZE)
+        ).mappings()]
+
+def insert_game_stats(rows):
+    """Bulk-insert GameStats rows and update the users' stats rollups in one transaction"""
+    try:
+        db.session.execute(insert(GameStats), rows)
+        apply_rollup(rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+stats_writer = StatsWriter(app, insert_game_stats, max_queue=STATS_QUEUE_SIZE,
+                           batch_size=STATS_BATCH_SIZE, flush_interval=STATS_FLUSH_INTERVAL,
+                           spill_path=STATS_SPILL_PATH)
+stats_writer.start()
+atexit.register(stats_writer.close)
+
+def on_game_evicted(game_id, game):
+    """Journal an evicted game and save its stats if it was abandoned by a logged-in player"""
+    record_game_event(EVENT_EVICTED, game_id)
+    if not FLUSH_ABANDONED_GAMES or not game.user_id or game.completed:
+        return
+    save_game_stats(game_id, game, game.user_id)
+
+active_games = create_game_store(
+    os.environ.get('GAME_STORE_URL', 'memory'),
+    max_games=GAME_STORE_MAX_GAMES,
+    idle_ttl=GAME_IDLE_TTL,
+    on_evict=on_game_evicted,
+)
+
+# === Crash-safe journal for the in-process game store ===
+GAME_JOURNAL_DIR = os.environ.get('GAME_JOURNAL_DIR')
+GAME_JOURNAL_FSYNC_INTERVAL = float(os.environ.get('GAME_JOURNAL_FSYNC_INTERVAL', 1.0))  # seconds
+GAME_SNAPSHOT_INTERVAL = float(os.environ.get('GAME_SNAPSHOT_INTERVAL', 300))  # seconds
+
+game_journal = None
+if GAME_JOURNAL_DIR and isinstance(active_games, MemoryGameStore):
+    game_journal = GameJournal(GAME_JOURNAL_DIR, fsync_interval=GAME_JOURNAL_FSYNC_INTERVAL,
+                               snapshot_interval=GAME_SNAPSHOT_INTERVAL)
+    atexit.register(game_journal.close)
+elif GAME_JOURNAL_DIR:
+    print("GAME_JOURNAL_DIR ignored: the configured game store is already shared and persistent")
+
+def record_game_event(event, game_id, game=None):
+    """Journal a game change (no-op when journaling is disabled)"""
+    if game_journal is not None:
+        game_journal.append(event, game_id, game)
+
+# === Player image lookups, cached on disk ===
+IMAGE_CACHE_PATH = os.environ.get('IMAGE_CACHE_PATH', os.path.join("data", "image_cache.db"))
+IMAGE_CACHE_TTL = float(os.environ.get('IMAGE_CACHE_TTL', 7 * 24 * 3600))  # seconds
+IMAGE_CACHE_NEGATIVE_TTL = float(os.environ.get('IMAGE_CACHE_NEGATIVE_TTL', 3600))  # seconds, for "no image found"
+IMAGE_SEARCH_TIMEOUT = float(os.environ.get('IMAGE_SEARCH_TIMEOUT', 5))  # deadline for all search variants, seconds
+IMAGE_SEARCH_WORKERS = int(os.environ.get('IMAGE_SEARCH_WORKERS', 8))  # threads for concurrent search variants, per worker
+
+# === Outbound HTTP, pooled keep-alive connections ===
+HTTP_MAX_PER_HOST = int(os.environ.get('HTTP_MAX_PER_HOST', 10))  # connections per upstream host, per worker
+HTTP_CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT', 3.05))  # seconds
+HTTP_READ_TIMEOUT = float(os.environ.get('HTTP_READ_TIMEOUT', 10))  # seconds
+http_client = HTTPClient(max_per_host=HTTP_MAX_PER_HOST, connect_timeout=HTTP_CONNECT_TIMEOUT,
+                         read_timeout=HTTP_READ_TIMEOUT)
+atexit.register(http_client.close)
+
+image_search = ImageSearch(ImageCache(IMAGE_CACHE_PATH, ttl=IMAGE_CACHE_TTL, negative_ttl=IMAGE_CACHE_NEGATIVE_TTL),
+                           http_client, search_timeout=IMAGE_SEARCH_TIMEOUT, search_workers=IMAGE_SEARCH_WORKERS)
+atexit.register(image_search.close)
 
 # === Root health check ===
 @app.route("/")
 def home():
     return "Backend is working!"
 
+# === Metrics endpoint ===
+@app.route("/metrics")
+def metrics():
+    return jsonify({
+        "grid_pool": grid_pool.metrics(),
+        "game_store": active_games.metrics(),
+        "stats_writer": stats_writer.metrics(),
+        "session_cache": session_cache.metrics(),
+        "password_hasher": password_hasher.metrics(),
+        "session_sweeper": session_sweeper.metrics(),
+        "leaderboards": leaderboards.metrics(),
+        "image_search": image_search.metrics(),
+        "http_client": http_client.metrics()
+    })
+
 # === Health check endpoint ===
 @app.route("/health")
 def health():
@@ -142,48 +322,74 @@ def get_stats():
     result, status_code = get_user_stats(user.id)
     return jsonify(result), status_code
 
-# === Helper to generate a valid grid ===
-def generate_grid(clubs, countries):
-    valid_pairs = set(VALID_PAIRS.keys())
-    valid_clubs = [club for club in clubs if any((c, club) in valid_pairs for c in countries)]
-    valid_countries = [c for c in countries if any((c, club) in valid_pairs for club in clubs)]
-
-    # Ensure we have enough valid combinations
-    if len(valid_clubs) < 3 or len(valid_countries) < 3:
-        return None, None
-
-    # Try multiple times to find a valid grid
-    for _ in range(100):
-        selected_clubs = random.sample(valid_clubs, 3)
-        selected_countries = random.sample(valid_countries, 3)
-        
-        # Check if all combinations are valid
-        if all((c, club) in valid_pairs for club in selected_clubs for c in selected_countries):
-            return selected_clubs, selected_countries
-    
-    return None, None
+# === Leaderboard endpoint ===
+@app.route("/leaderboard")
+def get_leaderboard():
+    """Top players by total score, optionally with one user's rank"""
+    difficulty = request.args.get("difficulty", ALL_DIFFICULTIES)
+    window = request.args.get("window", "all")
+    limit = max(1, min(request.args.get("limit", 10, type=int), 100))
+    user_id = request.args.get("user_id", type=int)
+
+    if difficulty != ALL_DIFFICULTIES and difficulty not in DIFFICULTY_POOLS:
+        return jsonify({"error": f"Unknown difficulty '{difficulty}'"}), 400
+    if window not in WINDOWS:
+        return jsonify({"error": f"Window must be one of: {', '.join(WINDOWS)}"}), 400
+
+    top = leaderboards.top(difficulty, window, limit)
+    user_ids = [entry_user_id for _, entry_user_id, _ in top]
+    usernames = dict(db.session.query(User.id, User.username).filter(User.id.in_(user_ids))) if user_ids else {}
+
+    as_of = leaderboards.as_of()
+    result = {
+        "difficulty": difficulty,
+        "window": window,
+        # Games saved after this (UTC) show up within LEADERBOARD_SYNC_INTERVAL seconds
+        "as_of": as_of.isoformat() if as_of else None,
+        "total_players": leaderboards.size(difficulty, window),
+        "entries": [
+            {"rank": rank, "user_id": entry_user_id, "username": usernames.get(entry_user_id), "score": score}
+            for rank, entry_user_id, score in top
+        ],
+    }
+    if user_id is not None:
+        ranking = leaderboards.rank_of(user_id, difficulty, window)
+        result["user"] = {"user_id": user_id, "rank": ranking[0], "score": ranking[1]} if ranking else None
+    return jsonify(result)
+
+def parse_user_id(value):
+    """Return an optional user id from request input as an int, raising ValueError unless it is a valid id"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(f"user_id must be an integer, got {value!r}")
+    user_id = int(value)
+    if not 0 <= user_id <= MAX_USER_ID:
+        raise ValueError(f"user_id out of range: {user_id}")
+    return user_id
+
+def parse_hint_count(value):
+    """Return the hint number from request input (default 1), raising ValueError unless it is 1..MAX_HINT_COUNT"""
+    if value is None or value == "":
+        return 1
+    hint_count = int(value)
+    if not 1 <= hint_count <= MAX_HINT_COUNT:
+        raise ValueError(f"hint_count out of range: {hint_count}")
+    return hint_count
 
 # === Endpoint to generate a grid ===
 @app.route("/generate-grid")
 def generate_grid_endpoint():
     difficulty = request.args.get("difficulty", "easy")
     game_id = request.args.get("game_id", "default")
+    try:
+        user_id = parse_user_id(request.args.get("user_id"))  # Optional, lets abandoned games be saved
+    except ValueError:
+        return jsonify({"error": "Invalid user_id"}), 400
 
-    if difficulty == "medium":
-        club_pool = medium_clubs
-    elif difficulty == "hard":
-        club_pool = hard_clubs
-    else:
-        club_pool = easy_clubs
-
-    if difficulty == "medium":
-        country_pool = medium_countries
-    elif difficulty == "hard":
-        country_pool = hard_countries
-    else:
-        country_pool = easy_countries
-
-    clubs, countries = generate_grid(club_pool, country_pool)
+    # Unknown difficulties use the easy pools
+    pool_key = difficulty if difficulty in RESOLVED_POOLS else "easy"
+    clubs, countries = grid_pool.get(pool_key)
     
     if clubs is None:
         return jsonify({"error": "Could not generate valid grid"}), 400
@@ -192,18 +398,9 @@ def generate_grid_endpoint():
     print(f"Setting difficulty to: '{difficulty}' for game {game_id}")
     
     # Store game state
-    active_games[game_id] = {
-        "clubs": clubs,
-        "countries": countries,
-        "difficulty": difficulty,
-        "guesses": {},
-        "completed": False,
-        "score": 0,
-        "hints_used": 0,
-        "total_hint_penalty": 0,
-        "hint_positions": {},  # Track revealed letter positions for each cell
-        "start_time": datetime.utcnow()  # Track when game started
-    }
+    game = GameState(clubs, countries, difficulty, user_id=user_id)
+    active_games.put(game_id, game)
+    record_game_event(EVENT_CREATED, game_id, game)
 
     return jsonify({
         "clubs": clubs,
@@ -216,48 +413,19 @@ def generate_grid_endpoint():
 def player_image(player_id):
     try:
         # Find the player by ID in our dataset
-        player_row = df[df['player_id'] == player_id]
-        if player_row.empty:
+        player_name = players.name_of(player_id)
+        if player_name is None:
             return "Player not found", 404
         
-        player_name = player_row.iloc[0]['name']
-        
-        # Search for player image using DuckDuckGo Images API
-        # Format: "player name fotmob" for better football-specific results
-        search_query = f"{player_name} fotmob"
-        
-        # DuckDuckGo Images API endpoint
-        api_url = "https://api.duckduckgo.com/"
-        params = {
-            'q': search_query,
-            'format': 'json',
-            'no_html': '1',
-            'skip_disambig': '1'
-        }
-        
-        response = requests.get(api_url, params=params, timeout=10)
-        response.raise_for_status()
+        # Search for player image using DuckDuckGo Images API ("player name fotmob"), cached per player
+        image_url, search_query = image_search.player_image(player_id, player_name)
         
-        data = response.json()
-        
-        # Extract image results
-        if 'Image' in data and data['Image']:
-            image_url = data['Image']
+        if image_url:
             return jsonify({
                 'image_url': image_url,
                 'player_name': player_name,
                 'search_query': search_query
             })
-        elif 'RelatedTopics' in data and data['RelatedTopics']:
-            # Look for image URLs in related topics
-            for topic in data['RelatedTopics']:
-                if 'Icon' in topic and topic['Icon']['URL']:
-                    image_url = topic['Icon']['URL']
-                    return jsonify({
-                        'image_url': image_url,
-                        'player_name': player_name,
-                        'search_query': search_query
-                    })
         
         # Fallback: return search query for manual search
         return jsonify({
@@ -288,52 +456,18 @@ def search_player_image():
         if not player_name:
             return jsonify({'error': 'Player name is required'}), 400
         
-        # Try multiple search strategies for better results
-        search_queries = [
-            f"{player_name} fotmob",
-            f"{player_name} football player",
-            f"{player_name} soccer player",
-            f"{player_name} transfermarkt"
-        ]
+        # Try multiple search strategies concurrently for better results, cached per normalized name
+        image_url, search_query = image_search.search(player_name)
         
-        # DuckDuckGo Images API endpoint
-        api_url = "https://api.duckduckgo.com/"
+        if image_url:
+            return jsonify({
+                'image_url': image_url,
+                'player_name': player_name,
+                'search_query': search_query,
+                'source': 'duckduckgo'
+            })
         
-        for search_query in search_queries:
-            params = {
-                'q': search_query,
-                'format': 'json',
-                'no_html': '1',
-                'skip_disambig': '1'
-            }
-            
-            try:
-                response = requests.get(api_url, params=params, timeout=5)
-                response.raise_for_status()
-                data = response.json()
-                
-                # Extract image results
-                if 'Image' in data and data['Image']:
-                    image_url = data['Image']
-                    return jsonify({
-                        'image_url': image_url,
-                        'player_name': player_name,
-                        'search_query': search_query,
-                        'source': 'duckduckgo'
-                    })
-                elif 'RelatedTopics' in data and data['RelatedTopics']:
-                    # Look for image URLs in related topics
-                    for topic in data['RelatedTopics']:
-                        if 'Icon' in topic and topic['Icon']['URL']:
-                            image_url = topic['Icon']['URL']
-                            return jsonify({
-                                'image_url': image_url,
-                                'player_name': player_name,
-                                'search_query': search_query,
-                                'source': 'duckduckgo'
-                            })
-            except:
-                continue
+        search_queries = [f"{player_name} {variant}" for variant in SEARCH_VARIANTS]
         
         # If no images found, return search links for manual searching
         search_links = {
@@ -358,44 +492,26 @@ def search_player_image():
         }), 500
 
 # === Helper to save game stats ===
-def save_game_stats(game_id, user_id=None):
-    """Save completed game statistics to database"""
-    if game_id not in active_games:
-        return False
-    
-    game = active_games[game_id]
-    
-    # Calculate time taken
-    start_time = game.get("start_time")
-    if start_time:
-        time_taken = int((datetime.utcnow() - start_time).total_seconds())
-    else:
-        time_taken = 0
-    
-    try:
-        # Create game stats record
-        game_stat = GameStats(
-            user_id=user_id,
-            game_id=game_id,
-            difficulty=game["difficulty"],
-            score=game["score"],
-            hints_used=game["hints_used"],
-            hint_penalty=game["total_hint_penalty"],
-            completed=game["completed"],
-            time_taken=time_taken
-        )
-        
-        db.session.add(game_stat)
-        db.session.commit()
-        
-        print(f"Game stats saved for game {game_id}")
-        return True
-        
-    except Exception as e:
-        print(f"Error saving game stats: {e}")
-        db.session.rollback()
+def save_game_stats(game_id, game, user_id=None):
+    """Queue a game's statistics for the background stats writer"""
+    if user_id is None:
+        # GameStats rows belong to a user; anonymous games are not recorded
         return False
 
+    stats_writer.submit({
+        "user_id": user_id,
+        "game_id": game_id,
+        "difficulty": game.difficulty,
+        "score": game.score,
+        "hints_used": game.hints_used,
+        "hint_penalty": game.total_hint_penalty,
+        "completed": game.completed,
+        "time_taken": int(time.time() - game.start_time),
+        "played_at": datetime.utcnow(),
+    })
+    print(f"Game stats queued for game {game_id}")
+    return True
+
 # === Endpoint to validate a player guess ===
 @app.route("/submit-guess", methods=["POST"])
 def submit_guess():
@@ -404,220 +520,231 @@ def submit_guess():
     country = data.get("country", "").strip()
     player_input = data.get("player", "").strip()
     game_id = data.get("game_id", "default")
-    user_id = data.get("user_id")  # Optional user ID for tracking
-
-    # Validate game exists
-    if game_id not in active_games:
-        return jsonify({"error": "Game not found"}), 404
-
-    game = active_games[game_id]
+    if not isinstance(game_id, str):
+        return jsonify({"error": "Invalid game_id"}), 400
+    try:
+        user_id = parse_user_id(data.get("user_id"))  # Optional user ID for tracking
+    except ValueError:
+        return jsonify({"error": "Invalid user_id"}), 400
+
+    with active_games.edit(game_id) as game:
+        # Validate game exists
+        if game is None:
+            return jsonify({"error": "Game not found"}), 404
+
+        # Validate the cell is in the current grid
+        cell = game.cell_index(club, country)
+        if cell is None:
+            return jsonify({"error": "Invalid club or country for this grid"}), 400
+
+        # Check if cell already filled
+        if game.guesses[cell]:
+            return jsonify({"error": "Cell already filled"}), 400
+
+        # Remember the player so the game can be saved if it is abandoned
+        if user_id:
+            game.user_id = user_id
+
+        # Look up the guess in the cell's normalized-name table
+        match = name_index.match(club, country, player_input)
+        if match is None:
+            return jsonify({"result": "incorrect"})
+
+        player_id, full_name = match
+
+        # Calculate points based on difficulty
+        if game.difficulty == "easy":
+            points = 20
+        elif game.difficulty == "medium":
+            points = 50
+        else:  # hard
+            points = 100
     
-    # Validate the cell is in the current grid
-    if club not in game["clubs"] or country not in game["countries"]:
-        return jsonify({"error": "Invalid club or country for this grid"}), 400
-
-    # Check if cell already filled
-    cell_key = f"{club}|{country}"
-    if cell_key in game["guesses"]:
-        return jsonify({"error": "Cell already filled"}), 400
-
-    # Find matching players
-    matches = df[(df["team"] == club) & (df["country"] == country)]
-
-    for _, row in matches.iterrows():
-        full_name = row["name"]
-        player_id = row.get("player_id", None)
-        parts = full_name.strip().split()
-        alt_name = " ".join(parts[1:]) if len(parts) > 1 else parts[0]
-
-        if player_input.lower() in (full_name.lower(), alt_name.lower()):
-            # Calculate points based on difficulty
-            if game["difficulty"] == "easy":
-                points = 20
-            elif game["difficulty"] == "medium":
-                points = 50
-            else:  # hard
-                points = 100
-            
-            # Add points to score
-            game["score"] += points
-            
-            # Debug: Print scoring information
-            print(f"Difficulty: {game['difficulty']}, Points calculated: {points}")
-            print(f"Final score: {game['score']}")
-            
-            # Store the guess
-            game["guesses"][cell_key] = {
-                "name": full_name,
-                "id": player_id if player_id else None,  # Handle case where ID might not exist
-                "club": club,
-                "country": country
-            }
-            
-            # Check if game is complete
-            if len(game["guesses"]) == 9:
-                game["completed"] = True
-                # Save game stats if user is logged in
-                if user_id:
-                    save_game_stats(game_id, user_id)
-                else:
-                    save_game_stats(game_id)  # Save as anonymous game
-            
-            return jsonify({
-                "result": "correct", 
-                "player": full_name,
-                "id": player_id,
-                "completed": game["completed"],
-                "score": game["score"],
-                "points_earned": points
-            })
-
-    return jsonify({"result": "incorrect"})
+        # Add points to score
+        game.score += points
+    
+        # Debug: Print scoring information
+        print(f"Difficulty: {game.difficulty}, Points calculated: {points}")
+        print(f"Final score: {game.score}")
+    
+        # Store the guess
+        game.guesses[cell] = player_id
+        record_game_event(EVENT_GUESS, game_id, game)
+    
+        # Check if game is complete
+        if game.filled_cells() == 9:
+            game.completed = True
+            # Save game stats if user is logged in
+            if user_id:
+                save_game_stats(game_id, game, user_id)
+            else:
+                save_game_stats(game_id, game)  # Save as anonymous game
+    
+        return jsonify({
+            "result": "correct", 
+            "player": full_name,
+            "id": player_id,
+            "completed": game.completed,
+            "score": game.score,
+            "points_earned": points
+        })
 
 # === Endpoint to get game state ===
 @app.route("/game-state/<game_id>")
 def get_game_state(game_id):
-    if game_id not in active_games:
+    game = active_games.get(game_id)
+    if game is None:
         return jsonify({"error": "Game not found"}), 404
     
-    game = active_games[game_id]
+    # Expand the per-cell player ids into the "club|country" guess map clients expect
+    guesses = {}
+    for cell, player_id in enumerate(game.guesses):
+        if player_id:
+            club, country = game.cell_at(cell)
+            guesses[f"{club}|{country}"] = {
+                "name": players.name_of(player_id),
+                "id": player_id,
+                "club": club,
+                "country": country
+            }
+
     return jsonify({
-        "clubs": game["clubs"],
-        "countries": game["countries"],
-        "difficulty": game["difficulty"],
-        "guesses": game["guesses"],
-        "completed": game["completed"],
-        "score": game["score"],
-        "total_hint_penalty": game["total_hint_penalty"]
+        "clubs": list(game.clubs),
+        "countries": list(game.countries),
+        "difficulty": game.difficulty,
+        "guesses": guesses,
+        "completed": game.completed,
+        "score": game.score,
+        "total_hint_penalty": game.total_hint_penalty
     })
 
 # === Endpoint to reset game ===
 @app.route("/reset-game/<game_id>")
 def reset_game(game_id):
-    if game_id in active_games:
-        del active_games[game_id]
+    active_games.delete(game_id)
+    record_game_event(EVENT_RESET, game_id)
     return jsonify({"message": "Game reset successfully"})
 
 # === Endpoint to get hints ===
 @app.route("/hint/<game_id>")
 def get_hint(game_id):
-    if game_id not in active_games:
-        return jsonify({"error": "Game not found"}), 400
-
-    game = active_games[game_id]
+    # The hint number sets the score penalty, so reject anything but a small positive int before touching the game
+    try:
+        hint_count = parse_hint_count(request.args.get('hint_count'))
+    except ValueError:
+        return jsonify({"error": f"hint_count must be an integer from 1 to {MAX_HINT_COUNT}"}), 400
 
-    # Get club and country from query parameters
-    club = request.args.get('club')
-    country = request.args.get('country')
-    hint_count = int(request.args.get('hint_count', 1))  # Default to 1 if not provided
+    with active_games.edit(game_id) as game:
+        if game is None:
+            return jsonify({"error": "Game not found"}), 400
 
-    if not club or not country:
-        return jsonify({"error": "Club and country parameters are required"}), 400
+        # Get club and country from query parameters
+        club = request.args.get('club')
+        country = request.args.get('country')
 
-    # Debug: Print what we received vs what's in the game
-    print(f"Received club: '{club}', country: '{country}', hint_count: {hint_count}")
-    print(f"Game clubs: {game['clubs']}")
-    print(f"Game countries: {game['countries']}")
+        if not club or not country:
+            return jsonify({"error": "Club and country parameters are required"}), 400
 
-    # Validate the cell is in the current grid
-    if club not in game["clubs"]:
-        return jsonify({"error": f"Club '{club}' not found in grid. Available clubs: {game['clubs']}"}), 400
+        # Debug: Print what we received vs what's in the game
+        print(f"Received club: '{club}', country: '{country}', hint_count: {hint_count}")
+        print(f"Game clubs: {list(game.clubs)}")
+        print(f"Game countries: {list(game.countries)}")
 
-    if country not in game["countries"]:
-        return jsonify({"error": f"Country '{country}' not found in grid. Available countries: {game['countries']}"}), 400
+        # Validate the cell is in the current grid
+        cell = game.cell_index(club, country)
+        if cell is None:
+            return jsonify({"error": "Invalid club or country for this grid"}), 400
 
-    # Check if cell already filled
-    cell_key = f"{club}|{country}"
-    if cell_key in game["guesses"]:
-        return jsonify({"error": "Cell already filled"}), 400
+        # Check if cell already filled
+        if game.guesses[cell]:
+            return jsonify({"error": "Cell already filled"}), 400
 
-    # Get a sample player for this specific combination
-    matches = df[(df["team"] == club) & (df["country"] == country)]
+        # Get a sample player for this specific combination
+        matches = players.candidates(club, country)
 
-    if len(matches) > 0:
-        sample_player = matches.iloc[0]["name"]
+        if matches:
+            sample_player = matches[0][1]
 
-        # Create cumulative hangman-like hint that builds upon previous hints
-        name_length = len(sample_player)
-        
-        # Get or create the hint positions for this cell
-        cell_key = f"{club}|{country}"
-        if cell_key not in game["hint_positions"]:
-            game["hint_positions"][cell_key] = set()
+            # Create cumulative hangman-like hint that builds upon previous hints
+            name_length = len(sample_player)
         
-        previously_revealed = game["hint_positions"][cell_key]
+            # Revealed letter positions for this cell, stored as a bitmask
+            revealed_mask = game.hint_masks[cell]
         
-        # Apply hint penalty based on hint count
-        hint_penalty = hint_count  # 1st hint = -1, 2nd hint = -2, etc.
-        game["score"] = max(0, game["score"] - hint_penalty)  # Don't go below 0
-        game["total_hint_penalty"] += hint_penalty
-        game["hints_used"] += 1
+            # Apply hint penalty based on hint count
+            hint_penalty = hint_count  # 1st hint = -1, 2nd hint = -2, etc.
+            game.score = max(0, game.score - hint_penalty)  # Don't go below 0
+            game.total_hint_penalty += hint_penalty
+            game.hints_used += 1
         
-        # Calculate how many new letters to reveal
-        if hint_count == 1:
-            new_letters_to_reveal = 2
-        else:
-            # Add 1-2 more random letters for each additional hint
-            new_letters_to_reveal = random.randint(1, 2)
+            # Calculate how many new letters to reveal
+            if hint_count == 1:
+                new_letters_to_reveal = 2
+            else:
+                # Add 1-2 more random letters for each additional hint
+                new_letters_to_reveal = random.randint(1, 2)
         
-        # Find positions that haven't been revealed yet
-        available_positions = [i for i in range(name_length) if i not in previously_revealed]
+            # Find positions that haven't been revealed yet (masks hold the first 64 letters)
+            available_positions = [i for i in range(min(name_length, 64)) if not revealed_mask >> i & 1]
         
-        # Randomly select new positions to reveal
-        if available_positions:
-            random.shuffle(available_positions)
-            new_reveal_positions = available_positions[:new_letters_to_reveal]
+            # Randomly select new positions to reveal
+            if available_positions:
+                random.shuffle(available_positions)
+                new_reveal_positions = available_positions[:new_letters_to_reveal]
             
-            # Add new positions to the previously revealed set
-            previously_revealed.update(new_reveal_positions)
-        else:
-            new_reveal_positions = []
-
-        hint_string = ""
-        for i, char in enumerate(sample_player):
-            if i in previously_revealed:
-                hint_string += char
-            elif char == " ":
-                hint_string += " "
+                # Add new positions to the revealed mask
+                for i in new_reveal_positions:
+                    revealed_mask |= 1 << i
+                game.hint_masks[cell] = revealed_mask
             else:
-                hint_string += "_"
+                new_reveal_positions = []
 
-        return jsonify({
-            "hint": f"Player name: {hint_string}",
-            "sample_player": sample_player,
-            "club": club,
-            "country": country,
-            "hint_count": hint_count,
-            "total_letters_revealed": len(previously_revealed),
-            "name_length": name_length,
-            "current_score": game["score"],
-            "hint_penalty": hint_penalty,
-            "total_hint_penalty": game["total_hint_penalty"]
-        })
+            record_game_event(EVENT_HINT, game_id, game)
 
-    return jsonify({"error": "No players found for this combination"}), 400
+            hint_string = ""
+            for i, char in enumerate(sample_player):
+                if revealed_mask >> i & 1:
+                    hint_string += char
+                elif char == " ":
+                    hint_string += " "
+                else:
+                    hint_string += "_"
+
+            return jsonify({
+                "hint": f"Player name: {hint_string}",
+                "sample_player": sample_player,
+                "club": club,
+                "country": country,
+                "hint_count": hint_count,
+                "total_letters_revealed": revealed_mask.bit_count(),
+                "name_length": name_length,
+                "current_score": game.score,
+                "hint_penalty": hint_penalty,
+                "total_hint_penalty": game.total_hint_penalty
+            })
+
+        return jsonify({"error": "No players found for this combination"}), 400
 
 @app.route("/give-up/<game_id>")
 def give_up(game_id):
-    if game_id not in active_games:
+    game = active_games.get(game_id)
+    if game is None:
         return jsonify({"error": "Game not found"}), 400
-
-    game = active_games[game_id]
     
     # Get all the correct answers for the current grid
     answers = []
-    for club in game["clubs"]:
-        for country in game["countries"]:
+    for club in game.clubs:
+        for country in game.countries:
             # Get a sample player for this combination
-            matches = df[(df["team"] == club) & (df["country"] == country)]
+            matches = players.candidates(club, country)
             
-            if len(matches) > 0:
-                sample_player = matches.iloc[0]
+            if matches:
+                player_id, player_name = matches[0]
                 answers.append({
                     "club": club,
                     "country": country,
-                    "player": sample_player["name"],
-                    "id": sample_player.get("id", None)  # Make ID optional
+                    "player": player_name,
+                    "id": player_id
                 })
     
     return jsonify({
@@ -629,10 +756,31 @@ def give_up(game_id):
 with app.app_context():
     try:
         db.create_all()
+        run_migrations()
         print("Database tables created successfully")
     except Exception as e:
         print(f"Error creating database tables: {e}")
 
+# === Background cleanup of expired sessions ===
+SESSION_SWEEP_INTERVAL = float(os.environ.get('SESSION_SWEEP_INTERVAL', 300))  # seconds; 0 disables the sweeper
+SESSION_SWEEP_BATCH_SIZE = int(os.environ.get('SESSION_SWEEP_BATCH_SIZE', 500))
+session_sweeper = SessionSweeper(app, batch_size=SESSION_SWEEP_BATCH_SIZE, interval=SESSION_SWEEP_INTERVAL)
+session_sweeper.start()
+
+# === Restore journaled games (evictions need record_game_event and save_game_stats above) ===
+# Journaling is only set up for the in-process store (see GAME_JOURNAL_DIR above)
+if game_journal is not None and isinstance(active_games, MemoryGameStore):
+    restored_games = game_journal.restore()
+    active_games.restore((game_id, game, last_access) for game_id, (last_access, game) in restored_games.items())
+    print(f"Restored {len(active_games)} of {len(restored_games)} journaled games from {game_journal.directory}")
+    game_journal.start(active_games.items)
+
+# === Leaderboards (needs the tables above) ===
+try:
+    leaderboards.start(load_leaderboard_sources, load_new_games)
+except Exception as e:
+    print(f"Error building leaderboards: {e}")
+
 # === Run server ===
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5001, debug=True)
@@ -3,7 +3,22 @@ import string
 from datetime import datetime, timedelta
 from functools import wraps
 from flask import request, jsonify, current_app
-from models import db, User, UserSession, GameStats
+from models import db, User, UserSession, GameStats, UserStatsSummary
+from password_hasher import PasswordHasherBusy
+from session_cache import SessionCache
+from signed_tokens import RevocationList, is_signed_token, issue_token, verify_token
+
+SESSION_LIFETIME = timedelta(days=7)
+
+# Token -> user snapshot for recently validated sessions; sized by app.py
+session_cache = SessionCache()
+
+# Logged-out signed tokens (AUTH_TOKEN_MODE=signed)
+revoked_tokens = RevocationList()
+
+def signed_tokens_enabled():
+    """True in AUTH_TOKEN_MODE=signed; in session mode signed tokens are never accepted"""
+    return current_app.config.get('AUTH_TOKEN_MODE') == 'signed'
 
 def generate_session_token(length=32):
     """Generate a random session token"""
@@ -12,15 +27,14 @@ def generate_session_token(length=32):
 
 def create_user_session(user_id):
     """Create a new user session"""
-    # Clean up expired sessions first
-    UserSession.query.filter(UserSession.expires_at < datetime.utcnow()).delete()
-    db.session.commit()
+    if signed_tokens_enabled():
+        return issue_token(current_app.config['SECRET_KEY'], user_id, SESSION_LIFETIME)
     
     # Generate new session token
     session_token = generate_session_token()
     
     # Create session (expires in 7 days)
-    expires_at = datetime.utcnow() + timedelta(days=7)
+    expires_at = datetime.utcnow() + SESSION_LIFETIME
     
     session = UserSession(
         user_id=user_id,
@@ -38,12 +52,37 @@ def get_user_from_session(session_token):
     if not session_token:
         return None
     
+    if signed_tokens_enabled() and is_signed_token(session_token):
+        return get_user_from_signed_token(session_token)
+    
+    user = session_cache.get(session_token)
+    if user is not None:
+        return user
+    
     session = UserSession.query.filter_by(session_token=session_token).first()
     
     if not session or session.is_expired():
         return None
     
-    return User.query.get(session.user_id)
+    user = User.query.get(session.user_id)
+    if user:
+        session_cache.put(session_token, user, session.expires_at)
+    return user
+
+def get_user_from_signed_token(session_token):
+    """Get user from a signed token without touching the database on the hot path"""
+    claims = verify_token(current_app.config['SECRET_KEY'], session_token)
+    if not claims or revoked_tokens.is_revoked(claims):
+        return None
+    
+    user = session_cache.get(session_token)
+    if user is not None:
+        return user
+    
+    user = User.query.get(claims['uid'])
+    if user:
+        session_cache.put(session_token, user, datetime.utcfromtimestamp(claims['exp']))
+    return user
 
 def require_auth(f):
     """Decorator to require authentication for endpoints"""
@@ -78,7 +117,10 @@ def register_user(username, password, email=None):
     
     # Create new user
     user = User(username=username, email=email)
-    user.set_password(password)
+    try:
+        user.set_password(password)
+    except PasswordHasherBusy:
+        return {'error': 'Server busy, please try again'}, 503
     
     try:
         db.session.add(user)
@@ -92,12 +134,20 @@ def authenticate_user(username, password):
     """Authenticate a user and return session token"""
     user = User.query.filter_by(username=username).first()
     
-    if not user or not user.check_password(password):
-        return {'error': 'Invalid username or password'}, 401
+    try:
+        if not user or not user.check_password(password):
+            return {'error': 'Invalid username or password'}, 401
+        
+        # Upgrade the hash if the configured bcrypt cost has changed
+        if user.password_needs_rehash():
+            user.set_password(password)
+    except PasswordHasherBusy:
+        return {'error': 'Server busy, please try again'}, 503
     
     # Update last login
     user.last_login = datetime.utcnow()
     db.session.commit()
+    session_cache.invalidate_user(user.id)
     
     # Create session
     session_token = create_user_session(user.id)
@@ -110,6 +160,13 @@ def authenticate_user(username, password):
 
 def logout_user(session_token):
     """Logout a user by removing their session"""
+    session_cache.invalidate(session_token)
+    
+    if signed_tokens_enabled() and is_signed_token(session_token):
+        claims = verify_token(current_app.config['SECRET_KEY'], session_token)
+        if claims:
+            revoked_tokens.revoke(claims)
+        return {'message': 'Logout successful'}, 200
     session = UserSession.query.filter_by(session_token=session_token).first()
     
     if session:
@@ -124,36 +181,34 @@ def get_user_stats(user_id):
     if not user:
         return {'error': 'User not found'}, 404
     
-    # Get all game stats for the user
-    game_stats = GameStats.query.filter_by(user_id=user_id).all()
+    # Per-difficulty totals, maintained incrementally as games are saved
+    rollups = UserStatsSummary.query.filter_by(user_id=user_id).all()
     
     # Calculate summary statistics
-    total_games = len(game_stats)
-    completed_games = len([g for g in game_stats if g.completed])
-    total_score = sum(g.score for g in game_stats)
-    total_hints_used = sum(g.hints_used for g in game_stats)
-    total_hint_penalty = sum(g.hint_penalty for g in game_stats)
+    total_games = sum(r.games_played for r in rollups)
+    completed_games = sum(r.games_completed for r in rollups)
+    total_score = sum(r.total_score for r in rollups)
+    total_hints_used = sum(r.total_hints_used for r in rollups)
+    total_hint_penalty = sum(r.total_hint_penalty for r in rollups)
     
     # Calculate average score
     avg_score = total_score / total_games if total_games > 0 else 0
     
     # Get difficulty breakdown
     difficulty_stats = {}
-    for stat in game_stats:
-        diff = stat.difficulty
-        if diff not in difficulty_stats:
-            difficulty_stats[diff] = {'count': 0, 'total_score': 0, 'completed': 0}
-        
-        difficulty_stats[diff]['count'] += 1
-        difficulty_stats[diff]['total_score'] += stat.score
-        if stat.completed:
-            difficulty_stats[diff]['completed'] += 1
-    
-    # Calculate averages for each difficulty
-    for diff in difficulty_stats:
-        count = difficulty_stats[diff]['count']
-        difficulty_stats[diff]['avg_score'] = difficulty_stats[diff]['total_score'] / count if count > 0 else 0
-        difficulty_stats[diff]['completion_rate'] = difficulty_stats[diff]['completed'] / count if count > 0 else 0
+    for r in rollups:
+        count = r.games_played
+        difficulty_stats[r.difficulty] = {
+            'count': count,
+            'total_score': r.total_score,
+            'completed': r.games_completed,
+            'avg_score': r.total_score / count if count > 0 else 0,
+            'completion_rate': r.games_completed / count if count > 0 else 0,
+            'best_time': r.best_time
+        }
+    
+    # Most recent games
+    recent_games = GameStats.query.filter_by(user_id=user_id).order_by(GameStats.played_at.desc()).limit(10).all()
     
     return {
         'user': user.to_dict(),
@@ -167,7 +222,7 @@ def get_user_stats(user_id):
             'total_hint_penalty': total_hint_penalty
         },
         'difficulty_breakdown': difficulty_stats,
-        'recent_games': [stat.to_dict() for stat in sorted(game_stats, key=lambda x: x.played_at, reverse=True)[:10]]
+        'recent_games': [stat.to_dict() for stat in recent_games]
     }, 200
 
 
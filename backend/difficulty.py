@@ -72,4 +72,11 @@ hard_countries = medium_countries + [
     "Samoa", "Tonga", "American Samoa", "Guam", "Northern Mariana Islands",
     "Palau", "Marshall Islands", "Micronesia", "Nauru", "Tuvalu",
     "Kiribati", "Wallis and Futuna", "Cook Islands", "Niue", "Tokelau"
-]
\ No newline at end of file
+]
+
+# Club and country pools for each difficulty level
+DIFFICULTY_POOLS = {
+    "easy": (easy_clubs, easy_countries),
+    "medium": (medium_clubs, medium_countries),
+    "hard": (hard_clubs, hard_countries),
+}
@@ -0,0 +1,256 @@
+"""
+Crash-safe persistence for in-process games in Tiki Taka Toe
+An append-only journal of game events plus periodic compacted snapshots, so
+a restarted worker can rebuild its active games
+"""
+
+import fcntl
+import glob
+import os
+import struct
+import threading
+import time
+import zlib
+
+from game_state import GameState
+
+EVENT_CREATED = 1
+EVENT_GUESS = 2
+EVENT_HINT = 3
+EVENT_RESET = 4
+EVENT_EVICTED = 5
+
+# Events that carry the game's full state after the change; the others remove the game
+UPSERT_EVENTS = {EVENT_CREATED, EVENT_GUESS, EVENT_HINT}
+
+# body length, crc32 of body
+RECORD_HEADER = struct.Struct("<II")
+# event type, game_id length, wall-clock time of the event
+RECORD_PREFIX = struct.Struct("<BHd")
+
+SNAPSHOT_MAGIC = b"TTTGAMES"
+# magic, generation covered by the snapshot, game count
+SNAPSHOT_HEADER = struct.Struct("<8sQI")
+
+
+# Upper bound on worker slots under one GAME_JOURNAL_DIR
+MAX_SLOTS = 64
+
+
+def encode_record(event, game_id, state=b"", at=None):
+    """Encode one journal record; at defaults to now"""
+    game_id_bytes = game_id.encode("utf-8")
+    at = time.time() if at is None else at
+    body = RECORD_PREFIX.pack(event, len(game_id_bytes), at) + game_id_bytes + state
+    return RECORD_HEADER.pack(len(body), zlib.crc32(body)) + body
+
+
+def read_records(data):
+    """Yield (event, game_id, at, state) from journal bytes, stopping at the first torn or corrupt record"""
+    offset = 0
+    while offset + RECORD_HEADER.size <= len(data):
+        length, crc = RECORD_HEADER.unpack_from(data, offset)
+        body = data[offset + RECORD_HEADER.size:offset + RECORD_HEADER.size + length]
+        if len(body) < length or zlib.crc32(body) != crc:
+            return
+        event, id_length, at = RECORD_PREFIX.unpack_from(body, 0)
+        game_id = bytes(body[RECORD_PREFIX.size:RECORD_PREFIX.size + id_length]).decode("utf-8")
+        yield event, game_id, at, body[RECORD_PREFIX.size + id_length:]
+        offset += RECORD_HEADER.size + length
+
+
+class GameJournal:
+    """Append-only game event journal with batched fsync and compacted snapshots.
+
+    append() only buffers the record; a background thread writes and fsyncs
+    the buffer every fsync_interval seconds, so requests never wait on disk.
+    Journals are numbered by generation. Compaction snapshots every live game,
+    starts a new generation once the snapshot is written, and then deletes
+    the journals the snapshot covers, so a crash at any point leaves a
+    restorable set of files. Appends wait while the snapshot is written.
+
+    Each process claims its own worker-N slot under directory, held with an
+    exclusive file lock for the life of the process, so gunicorn workers
+    sharing one directory never write to or compact each other's files. A
+    restarted worker takes over the first free slot and its games.
+    """
+
+    def __init__(self, directory, fsync_interval=1.0, snapshot_interval=300.0):
+        self.fsync_interval = fsync_interval
+        self.snapshot_interval = snapshot_interval
+        self.directory, self._slot_lock = self._claim_slot(directory)
+
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._thread = None
+        self._stop = threading.Event()
+        self._generation = max(self._journal_generations(), default=0) + 1
+        self._file = open(self._journal_path(self._generation), "ab")
+
+    @staticmethod
+    def _claim_slot(directory):
+        """Lock the first free worker-N subdirectory, returning (path, open lock file)"""
+        for slot in range(MAX_SLOTS):
+            path = os.path.join(directory, f"worker-{slot}")
+            os.makedirs(path, exist_ok=True)
+            lock_file = open(os.path.join(path, "journal.lock"), "a")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                continue
+            return path, lock_file
+        raise RuntimeError(f"Every game journal slot in {directory} is locked by another process")
+
+    def _journal_path(self, generation):
+        return os.path.join(self.directory, f"games.journal.{generation}")
+
+    def _snapshot_path(self):
+        return os.path.join(self.directory, "games.snapshot")
+
+    def _journal_generations(self):
+        generations = []
+        for path in glob.glob(os.path.join(self.directory, "games.journal.*")):
+            suffix = path.rsplit(".", 1)[1]
+            if suffix.isdigit():
+                generations.append(int(suffix))
+        return sorted(generations)
+
+    # === Writing ===
+    def append(self, event, game_id, game=None):
+        """Buffer an event; upsert events record the game's state after the change.
+
+        The caller has already changed the game, so a game that cannot be
+        serialized is journaled as removed rather than failing the request:
+        a restart then drops it instead of restoring an older state.
+        """
+        state = b""
+        if event in UPSERT_EVENTS:
+            if game is None:
+                raise ValueError(f"Event {event} for game {game_id} needs the game's state")
+            try:
+                state = game.serialize()
+            except (ValueError, struct.error) as e:
+                print(f"Cannot journal game {game_id}, recording it as removed: {e}")
+                event = EVENT_RESET
+        record = encode_record(event, game_id, state)
+        with self._lock:
+            self._buffer.append(record)
+
+    def flush(self):
+        """Write buffered records to the current journal and fsync it"""
+        with self._lock:
+            if not self._buffer:
+                return
+            self._file.write(b"".join(self._buffer))
+            self._buffer.clear()
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def compact(self, games):
+        """Snapshot the live games and drop the journals the snapshot supersedes.
+
+        games is a callable returning [(game_id, GameState, last_access), ...]
+        with last_access as a time.time() timestamp. It is called with
+        appends held off, so the snapshot covers exactly the current journal
+        generation, and a new generation starts only once the snapshot is on
+        disk; if writing it fails, the journals stay as they were. A game
+        that cannot be serialized is left out of the snapshot and logged
+        instead of failing the whole compaction.
+        """
+        tmp_path = self._snapshot_path() + ".tmp"
+        with self._lock:
+            if self._buffer:
+                self._file.write(b"".join(self._buffer))
+                self._buffer.clear()
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+            records = []
+            for game_id, game, last_access in games():
+                try:
+                    records.append(encode_record(EVENT_CREATED, game_id, game.serialize(), at=last_access))
+                except (ValueError, struct.error) as e:
+                    print(f"Leaving game {game_id} out of the journal snapshot: {e}")
+            covered = self._generation
+            try:
+                with open(tmp_path, "wb") as f:
+                    f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, covered, len(records)))
+                    f.write(b"".join(records))
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self._snapshot_path())
+            except OSError:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+            self._file.close()
+            self._generation += 1
+            self._file = open(self._journal_path(self._generation), "ab")
+
+        for generation in self._journal_generations():
+            if generation <= covered:
+                os.remove(self._journal_path(generation))
+
+    # === Recovery ===
+    def restore(self):
+        """Rebuild {game_id: (last_access, GameState)} from the latest snapshot plus the journal tail.
+
+        last_access is the time of the game's last journaled change, so the
+        caller can drop games that went idle while the process was down.
+        """
+        games = {}
+        covered = 0
+        try:
+            with open(self._snapshot_path(), "rb") as f:
+                data = f.read()
+            magic, covered, _ = SNAPSHOT_HEADER.unpack_from(data, 0)
+            if magic != SNAPSHOT_MAGIC:
+                raise ValueError("not a game snapshot")
+            for _, game_id, at, state in read_records(memoryview(data)[SNAPSHOT_HEADER.size:]):
+                games[game_id] = (at, GameState.deserialize(state))
+        except FileNotFoundError:
+            pass
+        except (ValueError, struct.error) as e:
+            print(f"Ignoring unreadable game snapshot: {e}")
+            games, covered = {}, 0
+
+        for generation in self._journal_generations():
+            if generation <= covered:
+                continue
+            with open(self._journal_path(generation), "rb") as f:
+                data = f.read()
+            for event, game_id, at, state in read_records(memoryview(data)):
+                if event in UPSERT_EVENTS:
+                    games[game_id] = (at, GameState.deserialize(state))
+                else:
+                    games.pop(game_id, None)
+        return games
+
+    # === Background work ===
+    def start(self, games):
+        """Start the flush/compaction thread; games is passed to compact()"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, args=(games,), name="game-journal", daemon=True)
+        self._thread.start()
+
+    def _run(self, games):
+        since_snapshot = 0.0
+        while not self._stop.wait(self.fsync_interval):
+            try:
+                since_snapshot += self.fsync_interval
+                if since_snapshot >= self.snapshot_interval:
+                    since_snapshot = 0.0
+                    self.compact(games)
+                else:
+                    self.flush()
+            except Exception as e:
+                print(f"Error writing game journal: {e}")
+
+    def close(self):
+        """Stop the background thread, flush anything still buffered and release the slot"""
+        self._stop.set()
+        self.flush()
+        self._slot_lock.close()
@@ -0,0 +1,116 @@
+"""
+Per-game state for Tiki Taka Toe
+A compact, slotted replacement for the per-game dicts kept in the game store
+"""
+
+import struct
+import time
+from array import array
+
+FORMAT_VERSION = 1
+
+# version, flags, score, hints_used, total_hint_penalty, user_id, start_time
+HEADER = struct.Struct("<BBiiiId")
+GUESSES = struct.Struct("<9I")
+HINT_MASKS = struct.Struct("<9Q")
+
+COMPLETED = 0x1
+HAS_USER = 0x2
+
+# user_id is stored as an unsigned 32-bit field
+MAX_USER_ID = 2 ** 32 - 1
+
+# Highest hint number per cell (the frontend offers at most 5)
+MAX_HINT_COUNT = 5
+
+# score, hints_used and total_hint_penalty are stored as signed 32-bit fields
+INT32_RANGE = (-2 ** 31, 2 ** 31 - 1)
+
+
+class GameState:
+    """State of one 3x3 grid.
+
+    Cells are numbered 0-8 as club_index * 3 + country_index. guesses holds
+    the accepted player_id per cell (0 when empty) and hint_masks holds the
+    revealed letter positions of each cell's hint as a bitmask.
+    """
+
+    __slots__ = ("clubs", "countries", "difficulty", "guesses", "hint_masks", "score",
+                 "hints_used", "total_hint_penalty", "completed", "start_time", "user_id")
+
+    def __init__(self, clubs, countries, difficulty, start_time=None, user_id=None):
+        self.clubs = tuple(clubs)
+        self.countries = tuple(countries)
+        self.difficulty = difficulty
+        self.guesses = array("I", [0] * 9)
+        self.hint_masks = array("Q", [0] * 9)
+        self.score = 0
+        self.hints_used = 0
+        self.total_hint_penalty = 0
+        self.completed = False
+        self.start_time = time.time() if start_time is None else start_time
+        self.user_id = user_id
+
+    def cell_index(self, club, country):
+        """Return the 0-8 index of a (club, country) cell, or None if it is not in the grid"""
+        if club not in self.clubs or country not in self.countries:
+            return None
+        return self.clubs.index(club) * 3 + self.countries.index(country)
+
+    def cell_at(self, cell):
+        """Return the (club, country) of a cell index"""
+        return self.clubs[cell // 3], self.countries[cell % 3]
+
+    def filled_cells(self):
+        """Return the number of cells with an accepted guess"""
+        return sum(1 for player_id in self.guesses if player_id)
+
+    def serialize(self):
+        """Pack the game into bytes for external stores and journals"""
+        for name in ("score", "hints_used", "total_hint_penalty"):
+            value = getattr(self, name)
+            if not INT32_RANGE[0] <= value <= INT32_RANGE[1]:
+                raise ValueError(f"{name} out of range for serialization: {value}")
+        if self.user_id is not None and not 0 <= self.user_id <= MAX_USER_ID:
+            raise ValueError(f"user_id out of range for serialization: {self.user_id}")
+        flags = (COMPLETED if self.completed else 0) | (HAS_USER if self.user_id is not None else 0)
+        parts = [
+            HEADER.pack(FORMAT_VERSION, flags, self.score, self.hints_used, self.total_hint_penalty,
+                        self.user_id or 0, self.start_time),
+            GUESSES.pack(*self.guesses),
+            HINT_MASKS.pack(*self.hint_masks),
+        ]
+        for text in (self.difficulty, *self.clubs, *self.countries):
+            data = text.encode("utf-8")
+            parts.append(struct.pack("<H", len(data)))
+            parts.append(data)
+        return b"".join(parts)
+
+    @classmethod
+    def deserialize(cls, data):
+        """Rebuild a game from serialize() output"""
+        version, flags, score, hints_used, total_hint_penalty, user_id, start_time = HEADER.unpack_from(data, 0)
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported game state version {version}")
+        offset = HEADER.size
+        guesses = GUESSES.unpack_from(data, offset)
+        offset += GUESSES.size
+        hint_masks = HINT_MASKS.unpack_from(data, offset)
+        offset += HINT_MASKS.size
+
+        texts = []
+        for _ in range(7):
+            (length,) = struct.unpack_from("<H", data, offset)
+            offset += 2
+            texts.append(bytes(data[offset:offset + length]).decode("utf-8"))
+            offset += length
+
+        game = cls(texts[1:4], texts[4:7], texts[0], start_time=start_time,
+                   user_id=user_id if flags & HAS_USER else None)
+        game.guesses = array("I", guesses)
+        game.hint_masks = array("Q", hint_masks)
+        game.score = score
+        game.hints_used = hints_used
+        game.total_hint_penalty = total_hint_penalty
+        game.completed = bool(flags & COMPLETED)
+        return game
@@ -0,0 +1,361 @@
+"""
+Game-state storage for Tiki Taka Toe
+Pluggable backends for active games so that every gunicorn worker can see
+(and safely update) the same game
+"""
+
+import fcntl
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from game_state import GameState
+
+try:
+    import redis
+except ImportError:
+    # Only needed for the Redis backend
+    redis = None
+
+
+class LockStripes:
+    """Per-game exclusive locks from a fixed pool, picked by a stable hash of the game id.
+
+    Games that share a stripe wait for each other, which is rare at the
+    default size, and memory stays bounded however many games exist. With a
+    path, each stripe is also an fcntl lock on one byte of that file, so the
+    lock holds across processes on the host.
+    """
+
+    def __init__(self, stripes=1024, path=None):
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._file = open(path, "a") if path else None
+
+    @contextmanager
+    def hold(self, game_id):
+        index = zlib.crc32(game_id.encode("utf-8")) % len(self._locks)
+        with self._locks[index]:
+            # fcntl locks belong to the process, so threads are kept apart by the lock above
+            if self._file is not None:
+                fcntl.lockf(self._file, fcntl.LOCK_EX, 1, index)
+            try:
+                yield
+            finally:
+                if self._file is not None:
+                    fcntl.lockf(self._file, fcntl.LOCK_UN, 1, index)
+
+
+class GameStore:
+    """Interface every game-state backend implements.
+
+    Games are GameState objects. edit() is the only way to change a game in place:
+    it holds the game exclusively for the duration of the with block and
+    writes it back on exit, so concurrent requests for the same game (even
+    on different workers, for the shared backends) never interleave. Edits
+    of different games run in parallel.
+
+    Games untouched for idle_ttl seconds, and the least recently used games
+    beyond max_games, are evicted. on_evict(game_id, game) is called for each
+    evicted game after it has been removed.
+    """
+
+    def __init__(self, max_games=None, idle_ttl=None, on_evict=None):
+        self.max_games = max_games
+        self.idle_ttl = idle_ttl
+        self.on_evict = on_evict
+        self._evicted = {"idle": 0, "lru": 0}
+
+    def _notify_evicted(self, evicted, reason):
+        self._evicted[reason] += len(evicted)
+        if self.on_evict is None:
+            return
+        for game_id, game in evicted:
+            try:
+                self.on_evict(game_id, game)
+            except Exception as e:
+                print(f"Error in game eviction callback for {game_id}: {e}")
+
+    def metrics(self):
+        """Return eviction counters and limits"""
+        return {
+            "max_games": self.max_games,
+            "idle_ttl": self.idle_ttl,
+            "evicted_idle": self._evicted["idle"],
+            "evicted_lru": self._evicted["lru"],
+        }
+
+    def get(self, game_id):
+        """Return the game, or None if it does not exist (read-only: change games through edit())"""
+        raise NotImplementedError
+
+    def put(self, game_id, game):
+        """Create or replace a game"""
+        raise NotImplementedError
+
+    def delete(self, game_id):
+        """Remove a game (no-op if it does not exist)"""
+        raise NotImplementedError
+
+    def edit(self, game_id):
+        """Context manager yielding the game (or None if missing) under an exclusive lock and saving it afterwards"""
+        raise NotImplementedError
+
+    def __contains__(self, game_id):
+        return self.get(game_id) is not None
+
+
+class MemoryGameStore(GameStore):
+    """In-process LRU store; only correct when the app runs a single worker"""
+
+    def __init__(self, max_games=None, idle_ttl=None, on_evict=None):
+        super().__init__(max_games, idle_ttl, on_evict)
+        self._games = OrderedDict()  # game_id -> (last access time, game), oldest first
+        self._lock = threading.RLock()  # guards the LRU itself, held only briefly
+        self._game_locks = LockStripes()
+        self._depth = 0
+        self._pending_idle = []
+        self._pending_lru = []
+
+    def _touch(self, game_id):
+        """Return a live game and mark it most recently used, evicting it if it has gone idle"""
+        entry = self._games.get(game_id)
+        if entry is None:
+            return None
+        now = time.monotonic()
+        if self.idle_ttl is not None and now - entry[0] > self.idle_ttl:
+            del self._games[game_id]
+            self._pending_idle.append((game_id, entry[1]))
+            return None
+        self._games[game_id] = (now, entry[1])
+        self._games.move_to_end(game_id)
+        return entry[1]
+
+    def _sweep(self):
+        """Evict idle games from the LRU end, then the oldest games beyond max_games"""
+        now = time.monotonic()
+        if self.idle_ttl is not None:
+            while self._games:
+                game_id, (last_access, game) = next(iter(self._games.items()))
+                if now - last_access <= self.idle_ttl:
+                    break
+                del self._games[game_id]
+                self._pending_idle.append((game_id, game))
+        if self.max_games is not None:
+            while len(self._games) > self.max_games:
+                game_id, (_, game) = self._games.popitem(last=False)
+                self._pending_lru.append((game_id, game))
+
+    @contextmanager
+    def _locked(self):
+        """Hold the store lock, running eviction callbacks only after it is released"""
+        idle, lru = [], []
+        try:
+            with self._lock:
+                self._depth += 1
+                try:
+                    yield
+                finally:
+                    self._depth -= 1
+                    if self._depth == 0:
+                        idle, lru = self._pending_idle, self._pending_lru
+                        self._pending_idle, self._pending_lru = [], []
+        finally:
+            self._notify_evicted(idle, "idle")
+            self._notify_evicted(lru, "lru")
+
+    def get(self, game_id):
+        with self._locked():
+            game = self._touch(game_id)
+        return game
+
+    def put(self, game_id, game):
+        with self._game_locks.hold(game_id):
+            with self._locked():
+                self._games[game_id] = (time.monotonic(), game)
+                self._games.move_to_end(game_id)
+                self._sweep()
+
+    def delete(self, game_id):
+        with self._lock:
+            self._games.pop(game_id, None)
+
+    @contextmanager
+    def edit(self, game_id):
+        # Games are edited in place, so only this game's lock is held while the caller works on it
+        with self._game_locks.hold(game_id):
+            with self._locked():
+                game = self._touch(game_id)
+            yield game
+
+    def items(self):
+        """Return [(game_id, game, last_access), ...] for every game held, last_access as a time.time() timestamp"""
+        with self._lock:
+            offset = time.time() - time.monotonic()
+            return [(game_id, game, last_access + offset) for game_id, (last_access, game) in self._games.items()]
+
+    def restore(self, games):
+        """Load games from (game_id, game, last_access) tuples, keeping their age so idle ones are evicted"""
+        offset = time.time() - time.monotonic()
+        with self._locked():
+            for game_id, game, last_access in sorted(games, key=lambda entry: entry[2]):
+                self._games[game_id] = (last_access - offset, game)
+                self._games.move_to_end(game_id)
+            self._sweep()
+
+    def __len__(self):
+        return len(self._games)
+
+    def metrics(self):
+        return {**super().metrics(), "games": len(self._games)}
+
+
+class SQLiteGameStore(GameStore):
+    """SQLite (WAL mode) store shared by every worker on one host.
+
+    A game's age is measured from its last write, and eviction runs whenever
+    a game is created. Per-game locks in a <path>.locks file serialize
+    edits of one game across workers, so the database write lock is only
+    taken for the final save.
+    """
+
+    def __init__(self, path, max_games=None, idle_ttl=None, on_evict=None):
+        super().__init__(max_games, idle_ttl, on_evict)
+        self.path = path
+        self._game_locks = LockStripes(path=path + ".locks")
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS games ("
+            "game_id TEXT PRIMARY KEY, state BLOB NOT NULL, updated_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_games_updated_at ON games (updated_at)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; transactions are opened explicitly in edit()
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _live_cutoff(self):
+        return time.time() - self.idle_ttl if self.idle_ttl is not None else 0
+
+    def _load(self, conn, game_id):
+        row = conn.execute(
+            "SELECT state FROM games WHERE game_id = ? AND updated_at >= ?",
+            (game_id, self._live_cutoff()),
+        ).fetchone()
+        return GameState.deserialize(row[0]) if row else None
+
+    def get(self, game_id):
+        return self._load(self._connect(), game_id)
+
+    def put(self, game_id, game):
+        conn = self._connect()
+        with self._game_locks.hold(game_id):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO games (game_id, state, updated_at) VALUES (?, ?, ?)",
+                    (game_id, game.serialize(), time.time()),
+                )
+                idle, lru = self._sweep(conn)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        self._notify_evicted(idle, "idle")
+        self._notify_evicted(lru, "lru")
+
+    def _sweep(self, conn):
+        """Delete idle games and the oldest games beyond max_games, returning what was removed"""
+        idle = []
+        if self.idle_ttl is not None:
+            idle = conn.execute(
+                "SELECT game_id, state FROM games WHERE updated_at < ?", (self._live_cutoff(),)
+            ).fetchall()
+            conn.execute("DELETE FROM games WHERE updated_at < ?", (self._live_cutoff(),))
+        lru = []
+        if self.max_games is not None:
+            lru = conn.execute(
+                "SELECT game_id, state FROM games ORDER BY updated_at DESC LIMIT -1 OFFSET ?",
+                (self.max_games,),
+            ).fetchall()
+            conn.executemany("DELETE FROM games WHERE game_id = ?", [(game_id,) for game_id, _ in lru])
+        return ([(game_id, GameState.deserialize(state)) for game_id, state in idle],
+                [(game_id, GameState.deserialize(state)) for game_id, state in lru])
+
+    def delete(self, game_id):
+        self._connect().execute("DELETE FROM games WHERE game_id = ?", (game_id,))
+
+    @contextmanager
+    def edit(self, game_id):
+        conn = self._connect()
+        with self._game_locks.hold(game_id):
+            game = self._load(conn, game_id)
+            yield game
+            # Skipped if the with block raised, leaving the stored game unchanged
+            if game is not None:
+                conn.execute(
+                    "UPDATE games SET state = ?, updated_at = ? WHERE game_id = ?",
+                    (game.serialize(), time.time(), game_id),
+                )
+
+
+class RedisGameStore(GameStore):
+    """Store for any Redis-compatible server, shared by workers across hosts.
+
+    Idle games expire server-side via key TTLs and the entry limit is left to
+    the server's maxmemory policy, so on_evict is never called.
+    """
+
+    def __init__(self, url, prefix="ttt:game:", lock_timeout=10, max_games=None, idle_ttl=None, on_evict=None):
+        super().__init__(max_games, idle_ttl, on_evict)
+        if redis is None:
+            raise RuntimeError("The redis package is required for the Redis game store")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.lock_timeout = lock_timeout
+
+    def get(self, game_id):
+        data = self.client.get(self.prefix + game_id)
+        return GameState.deserialize(data) if data else None
+
+    def put(self, game_id, game):
+        self.client.set(self.prefix + game_id, game.serialize(), ex=int(self.idle_ttl) if self.idle_ttl else None)
+
+    def delete(self, game_id):
+        self.client.delete(self.prefix + game_id)
+
+    @contextmanager
+    def edit(self, game_id):
+        with self.client.lock(f"{self.prefix}lock:{game_id}", timeout=self.lock_timeout):
+            game = self.get(game_id)
+            yield game
+            if game is not None:
+                self.put(game_id, game)
+
+
+def create_game_store(url, **options):
+    """Create a game store from a URL: 'memory', 'sqlite:///path/to/file.db' or 'redis://...'
+
+    options (max_games, idle_ttl, on_evict) are passed to the store.
+    """
+    if url == "memory":
+        return MemoryGameStore(**options)
+    if url.startswith("sqlite:///"):
+        path = url[len("sqlite:///"):]
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        return SQLiteGameStore(path, **options)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisGameStore(url, **options)
+    raise ValueError(f"Unsupported game store URL: {url}")
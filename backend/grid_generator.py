@@ -0,0 +1,134 @@
+"""
+Grid generation for Tiki Taka Toe
+Picks 3 clubs and 3 countries such that every (club, country) cell has at
+least one valid player, using per-club country bitsets built once at startup
+"""
+
+import random
+
+
+class GridGenerator:
+    """Constraint-driven grid generator over a club x country validity bitset.
+
+    Each club maps to an int whose bit i is set when at least one player from
+    country code i played there. A 3x3 grid is valid exactly when the three
+    clubs' masks intersect in at least three countries, so generation picks a
+    club triple with a large enough intersection and samples from it.
+    """
+
+    def __init__(self, store):
+        self.countries = store.countries
+        self.country_bits = {country: 1 << code for code, country in enumerate(store.countries)}
+        self.club_masks = {}
+        for club, country, _ in store.cells():
+            self.club_masks[club] = self.club_masks.get(club, 0) | self.country_bits[country]
+
+    def country_mask(self, countries):
+        """Return the bitset of the given countries (unknown countries are ignored)"""
+        mask = 0
+        for country in countries:
+            mask |= self.country_bits.get(country, 0)
+        return mask
+
+    def countries_in(self, mask):
+        """Return the country names whose bits are set in mask"""
+        names = []
+        while mask:
+            low = mask & -mask
+            names.append(self.countries[low.bit_length() - 1])
+            mask ^= low
+        return names
+
+    def generate(self, clubs, countries, rng=random):
+        """Return (clubs, countries) for a random valid grid, or (None, None) if none exists.
+
+        Clubs are visited in random order and triples are pruned as soon as a
+        pair's intersection drops below three countries, so the search always
+        terminates and only fails when no valid grid exists in the pools.
+        """
+        pool_mask = self.country_mask(countries)
+        candidates = []
+        for club in dict.fromkeys(clubs):
+            mask = self.club_masks.get(club, 0) & pool_mask
+            if mask.bit_count() >= 3:
+                candidates.append((club, mask))
+        rng.shuffle(candidates)
+
+        n = len(candidates)
+        for i in range(n):
+            club_a, mask_a = candidates[i]
+            for j in range(i + 1, n):
+                club_b, mask_b = candidates[j]
+                mask_ab = mask_a & mask_b
+                if mask_ab.bit_count() < 3:
+                    continue
+                for k in range(j + 1, n):
+                    club_c, mask_c = candidates[k]
+                    shared = mask_ab & mask_c
+                    if shared.bit_count() >= 3:
+                        selected_clubs = [club_a, club_b, club_c]
+                        rng.shuffle(selected_clubs)
+                        return selected_clubs, rng.sample(self.countries_in(shared), 3)
+
+        return None, None
+
+    def resolve_pool(self, clubs, countries, min_partners=3):
+        """Reduce a club/country pool to entries that can actually appear in a grid.
+
+        Entries are deduplicated (keeping first occurrence), entries with no
+        players are dropped, and then clubs with fewer than min_partners viable
+        countries and countries with fewer than min_partners viable clubs are
+        dropped repeatedly until the pool is stable. Returns
+        (clubs, countries, dropped) where dropped maps a reason to the names
+        removed for it.
+        """
+        dropped = {"duplicate": [], "no players": [], "too few partners": []}
+
+        def dedupe(names):
+            unique = list(dict.fromkeys(names))
+            for name in unique:
+                if names.count(name) > 1:
+                    dropped["duplicate"].append(name)
+            return unique
+
+        viable_clubs = []
+        for club in dedupe(clubs):
+            if self.club_masks.get(club):
+                viable_clubs.append(club)
+            else:
+                dropped["no players"].append(club)
+
+        viable_countries = []
+        for country in dedupe(countries):
+            if country in self.country_bits:
+                viable_countries.append(country)
+            else:
+                dropped["no players"].append(country)
+
+        while True:
+            pool_mask = self.country_mask(viable_countries)
+            kept_clubs = [club for club in viable_clubs
+                          if (self.club_masks[club] & pool_mask).bit_count() >= min_partners]
+            kept_countries = [country for country in viable_countries
+                              if sum(1 for club in kept_clubs
+                                     if self.club_masks[club] & self.country_bits[country]) >= min_partners]
+            if len(kept_clubs) == len(viable_clubs) and len(kept_countries) == len(viable_countries):
+                break
+            dropped["too few partners"].extend(club for club in viable_clubs if club not in kept_clubs)
+            dropped["too few partners"].extend(c for c in viable_countries if c not in kept_countries)
+            viable_clubs, viable_countries = kept_clubs, kept_countries
+
+        return viable_clubs, viable_countries, dropped
+
+    def resolve_pools(self, pools, min_partners=3):
+        """Resolve every difficulty's pools with resolve_pool and print what was dropped"""
+        resolved = {}
+        for difficulty, (clubs, countries) in pools.items():
+            viable_clubs, viable_countries, dropped = self.resolve_pool(clubs, countries, min_partners)
+            resolved[difficulty] = (viable_clubs, viable_countries)
+            print(f"Difficulty '{difficulty}': {len(viable_clubs)}/{len(clubs)} clubs, "
+                  f"{len(viable_countries)}/{len(countries)} countries viable")
+            for reason, names in dropped.items():
+                if names:
+                    print(f"  dropped ({reason}): {', '.join(names)}")
+        return resolved
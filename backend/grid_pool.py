@@ -0,0 +1,102 @@
+"""
+Pre-generated grid pool for Tiki Taka Toe
+Keeps a bounded queue of ready-made grids per difficulty so /generate-grid
+can serve one in O(1), with a background thread topping the queues back up
+"""
+
+import threading
+import time
+from collections import deque
+
+
+class GridPool:
+    """Bounded per-difficulty pools of (clubs, countries) grids with background refill.
+
+    The refill thread sleeps until a pool drops below its low watermark (or
+    refill_interval elapses) and then generates grids until every pool is back
+    at capacity. When a pool is empty, get() generates the grid inline.
+    """
+
+    def __init__(self, generate, pools, capacity=50, low_watermark=None, refill_interval=5.0):
+        self.generate = generate                  # (clubs, countries) -> (clubs, countries) or (None, None)
+        self.pools = pools                        # difficulty -> (club pool, country pool)
+        self.capacity = capacity
+        self.low_watermark = capacity // 2 if low_watermark is None else low_watermark
+        self.refill_interval = refill_interval
+
+        self._grids = {difficulty: deque(maxlen=capacity) for difficulty in pools}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+        self._served_from_pool = {difficulty: 0 for difficulty in pools}
+        self._served_inline = {difficulty: 0 for difficulty in pools}
+        self._refilled = {difficulty: 0 for difficulty in pools}
+        self._refill_seconds = 0.0
+
+    def start(self):
+        """Start the background refill thread (no-op if already running or disabled)"""
+        if self.capacity <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="grid-pool-refill", daemon=True)
+        self._thread.start()
+
+    def get(self, difficulty):
+        """Return a (clubs, countries) grid for a difficulty, or (None, None) if none exists"""
+        with self._lock:
+            grids = self._grids[difficulty]
+            grid = grids.popleft() if grids else None
+            if grid is not None:
+                self._served_from_pool[difficulty] += 1
+            else:
+                self._served_inline[difficulty] += 1
+            if len(grids) < self.low_watermark:
+                self._wake.set()
+
+        if grid is not None:
+            clubs, countries = grid
+            return list(clubs), list(countries)
+
+        clubs, countries = self.pools[difficulty]
+        return self.generate(clubs, countries)
+
+    def _refill(self):
+        for difficulty, (clubs, countries) in self.pools.items():
+            while len(self._grids[difficulty]) < self.capacity:
+                start = time.perf_counter()
+                selected_clubs, selected_countries = self.generate(clubs, countries)
+                elapsed = time.perf_counter() - start
+                if selected_clubs is None:
+                    break  # Pool cannot produce a grid; get() will report the failure inline
+                with self._lock:
+                    self._grids[difficulty].append((tuple(selected_clubs), tuple(selected_countries)))
+                    self._refilled[difficulty] += 1
+                    self._refill_seconds += elapsed
+
+    def _run(self):
+        while True:
+            try:
+                self._refill()
+            except Exception as e:
+                print(f"Error refilling grid pool: {e}")
+            self._wake.wait(self.refill_interval)
+            self._wake.clear()
+
+    def metrics(self):
+        """Return pool depth and refill statistics per difficulty"""
+        with self._lock:
+            refilled_total = sum(self._refilled.values())
+            return {
+                "capacity": self.capacity,
+                "low_watermark": self.low_watermark,
+                "refill_rate_per_sec": round(refilled_total / self._refill_seconds, 1) if self._refill_seconds else None,
+                "difficulties": {
+                    difficulty: {
+                        "depth": len(self._grids[difficulty]),
+                        "served_from_pool": self._served_from_pool[difficulty],
+                        "served_inline": self._served_inline[difficulty],
+                        "refilled": self._refilled[difficulty],
+                    }
+                    for difficulty in self.pools
+                },
+            }
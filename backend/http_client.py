@@ -0,0 +1,83 @@
+"""
+Shared outbound HTTP client for Tiki Taka Toe
+One requests.Session with pooled keep-alive connections, a per-host
+connection cap and default connect/read timeouts, for every upstream call
+"""
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class HTTPClient:
+    """Thread-safe pooled HTTP client.
+
+    Connections are kept alive and reused per host. At most max_per_host
+    connections are open to any one host; when all are busy, further
+    requests wait for one to be returned instead of opening more. Every
+    request gets (connect_timeout, read_timeout) unless it passes its own.
+    """
+
+    def __init__(self, max_per_host=10, max_hosts=10, connect_timeout=3.05, read_timeout=10.0, retries=0):
+        self.max_per_host = max_per_host
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.session = requests.Session()
+        self.adapter = HTTPAdapter(pool_connections=max_hosts, pool_maxsize=max_per_host,
+                                   max_retries=retries, pool_block=True)
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._errors = 0
+        self._timeouts = 0
+
+    def get(self, url, timeout=None, **kwargs):
+        """GET through the pool; timeout is a read timeout in seconds or a (connect, read) tuple"""
+        if timeout is None:
+            timeout = (self.connect_timeout, self.read_timeout)
+        elif not isinstance(timeout, tuple):
+            timeout = (self.connect_timeout, timeout)
+        with self._lock:
+            self._requests += 1
+        try:
+            return self.session.get(url, timeout=timeout, **kwargs)
+        except requests.Timeout:
+            with self._lock:
+                self._timeouts += 1
+            raise
+        except requests.RequestException:
+            with self._lock:
+                self._errors += 1
+            raise
+
+    def connections_opened(self):
+        """Return the number of connections opened so far across every host pool"""
+        pools = self.adapter.poolmanager.pools
+        opened = 0
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                opened += pool.num_connections
+        return opened
+
+    def metrics(self):
+        """Return request, error and connection counters"""
+        with self._lock:
+            requests_sent = self._requests
+            counters = {"requests": requests_sent, "errors": self._errors, "timeouts": self._timeouts}
+        opened = self.connections_opened()
+        return {
+            "max_per_host": self.max_per_host,
+            "connect_timeout": self.connect_timeout,
+            "read_timeout": self.read_timeout,
+            **counters,
+            "connections_opened": opened,
+            "requests_per_connection": round(requests_sent / opened, 2) if opened else None,
+        }
+
+    def close(self):
+        """Close every pooled connection"""
+        self.session.close()
@@ -0,0 +1,365 @@
+"""
+Player image lookup for Tiki Taka Toe
+Finds player photos through the DuckDuckGo Instant Answer API and keeps the
+answers (including "no image") in a persistent SQLite cache
+"""
+
+import secrets
+import sqlite3
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Optional
+
+import requests
+
+from answer_index import normalize_name
+
+API_URL = "https://api.duckduckgo.com/"
+
+# Query suffixes for /search-player-image, most preferred first
+SEARCH_VARIANTS = ("fotmob", "football player", "soccer player", "transfermarkt")
+
+
+def extract_image_url(data):
+    """Return the first image URL in a DuckDuckGo response, or None"""
+    if data.get('Image'):
+        return data['Image']
+    for topic in data.get('RelatedTopics') or []:
+        icon = topic.get('Icon') or {}
+        if icon.get('URL'):
+            return icon['URL']
+    return None
+
+
+class ImageCache:
+    """SQLite cache of lookup key -> (image_url, search_query).
+
+    Found images are kept for ttl seconds and "no image found" answers
+    (stored with image_url NULL) for negative_ttl seconds. The file is shared
+    by every worker on the host, and also holds short-lived leases that let
+    one worker at a time look a key up upstream.
+    """
+
+    PURGE_EVERY = 1000  # puts between deletions of expired rows
+
+    def __init__(self, path, ttl=7 * 24 * 3600.0, negative_ttl=3600.0):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._negative_hits = 0
+        self._misses = 0
+        self._puts = 0
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS image_cache ("
+            "key TEXT PRIMARY KEY, image_url TEXT, search_query TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS image_leases ("
+            "key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def peek(self, key):
+        """get() without counting a hit or miss"""
+        row = self._connect().execute(
+            "SELECT image_url, search_query FROM image_cache WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return tuple(row) if row else None
+
+    def get(self, key):
+        """Return (image_url, search_query) for a live entry, where image_url None means "no image", or None on a miss"""
+        row = self.peek(key)
+        with self._lock:
+            if row is None:
+                self._misses += 1
+            elif row[0] is None:
+                self._negative_hits += 1
+            else:
+                self._hits += 1
+        return row
+
+    def put(self, key, image_url, search_query):
+        """Store a lookup result; image_url None records that no image was found"""
+        ttl = self.ttl if image_url is not None else self.negative_ttl
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO image_cache (key, image_url, search_query, expires_at) VALUES (?, ?, ?, ?)",
+            (key, image_url, search_query, time.time() + ttl),
+        )
+        with self._lock:
+            self._puts += 1
+            purge = self._puts % self.PURGE_EVERY == 0
+        if purge:
+            conn.execute("DELETE FROM image_cache WHERE expires_at <= ?", (time.time(),))
+            conn.execute("DELETE FROM image_leases WHERE expires_at <= ?", (time.time(),))
+
+    # === Leases ===
+    def acquire_lease(self, key, owner, ttl):
+        """Take the lease on key for ttl seconds unless another owner holds a live one; return whether it was taken"""
+        now = time.time()
+        cursor = self._connect().execute(
+            "INSERT INTO image_leases (key, owner, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+            "WHERE image_leases.expires_at <= ?",
+            (key, owner, now + ttl, now),
+        )
+        return cursor.rowcount == 1
+
+    def lease_held(self, key):
+        """Return whether anyone holds a live lease on key"""
+        return self._connect().execute(
+            "SELECT 1 FROM image_leases WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone() is not None
+
+    def release_lease(self, key, owner):
+        """Give up a lease taken by owner (no-op if it expired and was taken over)"""
+        self._connect().execute("DELETE FROM image_leases WHERE key = ? AND owner = ?", (key, owner))
+
+    def metrics(self):
+        """Return hit/miss counters and the hit rate"""
+        with self._lock:
+            lookups = self._hits + self._negative_hits + self._misses
+            return {
+                "ttl": self.ttl,
+                "negative_ttl": self.negative_ttl,
+                "hits": self._hits,
+                "negative_hits": self._negative_hits,
+                "misses": self._misses,
+                "hit_rate": round((self._hits + self._negative_hits) / lookups, 3) if lookups else None,
+            }
+
+
+class SingleFlight:
+    """Collapses concurrent calls for the same key within this process into one.
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight wait for it and get the same result or exception. Nothing
+    is remembered once the call returns.
+    """
+
+    class _Call:
+        __slots__ = ("done", "result", "error")
+
+        def __init__(self):
+            self.done = threading.Event()
+            self.result: Any = None
+            self.error: Optional[BaseException] = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._flights = 0
+        self._coalesced = 0
+
+    def do(self, key, fn):
+        """Run fn() for key, or wait for the call already in flight for it"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+                self._flights += 1
+            else:
+                self._coalesced += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def metrics(self):
+        """Return how many calls ran and how many were coalesced into them"""
+        with self._lock:
+            return {"flights": self._flights, "coalesced": self._coalesced, "in_flight": len(self._calls)}
+
+
+class ImageSearch:
+    """Cached player image lookups against the DuckDuckGo API.
+
+    Both lookups return (image_url, search_query), with image_url None when
+    no image was found. Upstream failures are not cached. Requests go through
+    the shared HTTPClient; player_image uses its default timeouts. search
+    sends every SEARCH_VARIANTS query at once on a small thread pool and
+    gives them search_timeout seconds in total.
+
+    Concurrent lookups of the same key share one upstream call. Within a
+    process SingleFlight does it; across workers, the one that takes the
+    key's lease in the shared cache looks it up, and the others wait for the
+    lease to go and read its answer from the cache. If the holder caches
+    nothing (an upstream error, or a search cut off by its deadline) or keeps
+    the lease past one lease period, the waiters look the key up themselves.
+    """
+
+    LEASE_POLL_INTERVAL = 0.05  # seconds between checks while another worker holds a lease
+
+    def __init__(self, cache, http, api_url=API_URL, search_timeout=5.0, search_workers=8):
+        self.cache = cache
+        self.http = http
+        self.api_url = api_url
+        self.search_timeout = search_timeout
+        self._flights = SingleFlight()
+        self._executor = ThreadPoolExecutor(max_workers=search_workers, thread_name_prefix="image-search")
+        self._lock = threading.Lock()
+        self._upstream_calls = 0
+        self._upstream_errors = 0
+        self._searches_timed_out = 0
+        self._variants_abandoned = 0
+        self._coalesced_remote = 0
+
+    def _query(self, search_query, timeout=None):
+        """Ask DuckDuckGo for one query and return its image URL or None (raises requests.RequestException)"""
+        params = {
+            'q': search_query,
+            'format': 'json',
+            'no_html': '1',
+            'skip_disambig': '1'
+        }
+        with self._lock:
+            self._upstream_calls += 1
+        try:
+            response = self.http.get(self.api_url, params=params, timeout=timeout)
+            response.raise_for_status()
+            return extract_image_url(response.json())
+        except (requests.RequestException, ValueError) as e:
+            with self._lock:
+                self._upstream_errors += 1
+            raise requests.RequestException(str(e)) from e
+
+    def player_image(self, player_id, player_name):
+        """Image for a player in the dataset, searched as "<name> fotmob" """
+        key = f"player:{player_id}"
+        return self._flights.do(key, lambda: self._player_image(key, player_name))
+
+    def _player_image(self, key, player_name):
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        lease_ttl = self.http.connect_timeout + self.http.read_timeout + 1
+        return self._across_workers(key, lease_ttl, lambda: self._fetch_player_image(key, player_name))
+
+    def _fetch_player_image(self, key, player_name):
+        search_query = f"{player_name} fotmob"
+        image_url = self._query(search_query)
+        self.cache.put(key, image_url, search_query)
+        return image_url, search_query
+
+    def search(self, player_name):
+        """Image for any player name, querying every SEARCH_VARIANTS suffix concurrently"""
+        key = f"name:{normalize_name(player_name)}"
+        return self._flights.do(key, lambda: self._search(key, player_name))
+
+    def _search(self, key, player_name):
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        return self._across_workers(key, self.search_timeout + 1, lambda: self._fan_out(key, player_name))
+
+    def _fan_out(self, key, player_name):
+        """Variant fan-out behind search.
+
+        The most preferred variant that finds an image wins, so a hit is
+        returned as soon as every variant ahead of it has missed or failed.
+        Variants still pending at that point or at the deadline are
+        abandoned: queued ones are cancelled and running ones are left to
+        hit their own timeout, with their answers discarded.
+        """
+        deadline = time.monotonic() + self.search_timeout
+        queries = [f"{player_name} {variant}" for variant in SEARCH_VARIANTS]
+        futures = [self._executor.submit(self._query, query, self.search_timeout) for query in queries]
+        try:
+            pending = set(futures)
+            while True:
+                # Walk the variants in preference order until one is still outstanding
+                for query, future in zip(queries, futures):
+                    if not future.done():
+                        break
+                    if future.exception() is None and future.result() is not None:
+                        self.cache.put(key, future.result(), query)
+                        return future.result(), query
+                else:
+                    break  # every variant answered without an image
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    with self._lock:
+                        self._searches_timed_out += 1
+                    # Out of time: settle for the best image that did arrive, uncached
+                    for query, future in zip(queries, futures):
+                        if future.done() and future.exception() is None and future.result() is not None:
+                            return future.result(), query
+                    return None, queries[0]
+                pending = {future for future in pending if not future.done()}
+                wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        finally:
+            abandoned = [future for future in futures if not future.done()]
+            for future in abandoned:
+                future.cancel()
+            if abandoned:
+                with self._lock:
+                    self._variants_abandoned += len(abandoned)
+        # Only remember "no image" when every variant actually answered
+        if all(future.exception() is None for future in futures):
+            self.cache.put(key, None, queries[0])
+        return None, queries[0]
+
+    def _across_workers(self, key, lease_ttl, fetch):
+        """Run fetch() under the key's cache lease, or wait for the worker holding it and use its cached answer"""
+        owner = secrets.token_hex(8)
+        if not self.cache.acquire_lease(key, owner, lease_ttl):
+            deadline = time.monotonic() + lease_ttl
+            while self.cache.lease_held(key) and time.monotonic() < deadline:
+                time.sleep(self.LEASE_POLL_INTERVAL)
+            cached = self.cache.peek(key)
+            if cached is not None:
+                with self._lock:
+                    self._coalesced_remote += 1
+                return cached
+            # The holder failed or timed out without caching anything: look it up here
+            if not self.cache.acquire_lease(key, owner, lease_ttl):
+                owner = None
+        try:
+            cached = self.cache.peek(key)  # answered by a worker that finished before the lease was taken
+            if cached is not None:
+                return cached
+            return fetch()
+        finally:
+            if owner is not None:
+                self.cache.release_lease(key, owner)
+
+    def metrics(self):
+        """Return cache metrics plus upstream call counts"""
+        with self._lock:
+            upstream = {
+                "upstream_calls": self._upstream_calls,
+                "upstream_errors": self._upstream_errors,
+                "searches_timed_out": self._searches_timed_out,
+                "variants_abandoned": self._variants_abandoned,
+                "coalesced_remote": self._coalesced_remote,
+            }
+        return {**self.cache.metrics(), **upstream, **self._flights.metrics()}
+
+    def close(self):
+        """Stop the search thread pool, dropping queued variant queries"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -4,17 +4,18 @@ Database initialization script for Tiki Taka Toe
 Run this script to create the database and tables
 """
 
-import os
 from app import create_app
-from models import db, User, GameStats, UserSession
+from models import db, User
+from migrations import run_migrations
 
 def init_database():
     """Initialize the database and create tables"""
     app = create_app()
     
     with app.app_context():
-        # Create all tables
+        # Create all tables, then bring existing ones up to date
         db.create_all()
+        run_migrations()
         print("Database tables created successfully!")
         
         # Create a test admin user if it doesn't exist
@@ -0,0 +1,354 @@
+"""
+Leaderboards for Tiki Taka Toe
+Global and per-difficulty score leaderboards, all time and over a rolling
+7-day window, kept in memory in order-statistics trees so top-N and a
+user's rank are O(log n), and kept up to date by polling for new games
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+ALL_DIFFICULTIES = "all"
+WINDOWS = {"all": None, "week": timedelta(days=7)}
+
+
+class _Node:
+    __slots__ = ("key", "priority", "left", "right", "size")
+
+    def __init__(self, key):
+        self.key = key
+        self.priority = random.random()
+        self.left = None
+        self.right = None
+        self.size = 1
+
+
+def _size(node):
+    return node.size if node is not None else 0
+
+
+def _update(node):
+    node.size = 1 + _size(node.left) + _size(node.right)
+    return node
+
+
+def _split(node, key, inclusive=False):
+    """Split into (keys < key, keys >= key), or (<=, >) when inclusive"""
+    if node is None:
+        return None, None
+    goes_left = node.key <= key if inclusive else node.key < key
+    if goes_left:
+        node.right, right = _split(node.right, key, inclusive)
+        return _update(node), right
+    left, node.left = _split(node.left, key, inclusive)
+    return left, _update(node)
+
+
+def _merge(left, right):
+    """Merge two treaps where every key in left is below every key in right"""
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        return _update(left)
+    right.left = _merge(left, right.left)
+    return _update(right)
+
+
+class OrderStatisticTree:
+    """Treap of unique, comparable keys with subtree sizes.
+
+    insert, remove and count_less run in expected O(log n); first(n)
+    returns the n smallest keys in O(log n + n).
+    """
+
+    def __init__(self):
+        self.root = None
+
+    def __len__(self):
+        return _size(self.root)
+
+    @classmethod
+    def from_sorted(cls, keys):
+        """Build a tree from unique keys in ascending order in O(n)"""
+        tree = cls()
+        stack = []  # right spine of the tree built so far
+        for key in keys:
+            node = _Node(key)
+            last = None
+            while stack and stack[-1].priority < node.priority:
+                # A node leaving the spine has a finished subtree, and the one popped before it is its right child
+                last = _update(stack.pop())
+            node.left = last
+            if stack:
+                stack[-1].right = node
+            stack.append(node)
+        for node in reversed(stack):
+            _update(node)
+        tree.root = stack[0] if stack else None
+        return tree
+
+    def insert(self, key):
+        left, right = _split(self.root, key)
+        self.root = _merge(_merge(left, _Node(key)), right)
+
+    def remove(self, key):
+        left, rest = _split(self.root, key)
+        _, right = _split(rest, key, inclusive=True)
+        self.root = _merge(left, right)
+
+    def count_less(self, key):
+        """Return how many keys are strictly below key"""
+        node, count = self.root, 0
+        while node is not None:
+            if node.key < key:
+                count += _size(node.left) + 1
+                node = node.right
+            else:
+                node = node.left
+        return count
+
+    def first(self, n):
+        """Return the n smallest keys in order"""
+        keys, stack, node = [], [], self.root
+        while (stack or node is not None) and len(keys) < n:
+            while node is not None:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            keys.append(node.key)
+            node = node.right
+        return keys
+
+
+class RankedBoard:
+    """User scores ranked highest first; users with the same score share a rank"""
+
+    def __init__(self, scores=None):
+        self.scores = {user_id: score for user_id, score in (scores or {}).items() if score > 0}
+        # keys are (-score, user_id)
+        self.tree = OrderStatisticTree.from_sorted(sorted((-score, user_id) for user_id, score in self.scores.items()))
+
+    def __len__(self):
+        return len(self.scores)
+
+    def add(self, user_id, points):
+        """Add points (possibly negative) to a user; users left with no points are unranked"""
+        if not points:
+            return
+        old = self.scores.get(user_id, 0)
+        if old:
+            self.tree.remove((-old, user_id))
+        new = old + points
+        if new > 0:
+            self.scores[user_id] = new
+            self.tree.insert((-new, user_id))
+        else:
+            self.scores.pop(user_id, None)
+
+    def _rank(self, score):
+        # (-score,) sorts before every (-score, user_id), so this counts only strictly higher scores
+        return self.tree.count_less((-score,)) + 1
+
+    def top(self, n):
+        """Return [(rank, user_id, score), ...] for the n best users"""
+        return [(self._rank(-negative_score), user_id, -negative_score)
+                for negative_score, user_id in self.tree.first(n)]
+
+    def rank_of(self, user_id):
+        """Return (rank, score) for a user, or None if they are unranked"""
+        score = self.scores.get(user_id)
+        if score is None:
+            return None
+        return self._rank(score), score
+
+
+class Leaderboards:
+    """Every (difficulty, window) board, updated incrementally and rebuilt periodically.
+
+    record() applies saved games. Games enter the weekly boards in
+    played_at order and are subtracted again once they are older than the
+    window. Every sync_interval seconds, sync() records the games that any
+    worker saved since the highest GameStats id seen, so every worker's
+    boards trail the database by about sync_interval. rebuild() replaces
+    the boards with totals read back from the database every
+    rebuild_interval seconds, correcting any drift, such as a game
+    committed after a sync had already read past its id.
+    """
+
+    def __init__(self, difficulties, rebuild_interval=300.0, sync_interval=5.0):
+        self.difficulties = tuple(difficulties)
+        self.rebuild_interval = rebuild_interval
+        self.sync_interval = sync_interval
+        self._lock = threading.Lock()
+        self._boards, self._recent = self._empty()
+        self._last_id = 0
+        self._as_of = None
+        self._thread = None
+
+        self._recorded = 0
+        self._rebuilds = 0
+        self._syncs = 0
+        self._last_rebuild_seconds = None
+
+    def _empty(self):
+        boards = {(difficulty, window): RankedBoard()
+                  for difficulty in (ALL_DIFFICULTIES, *self.difficulties) for window in WINDOWS}
+        return boards, deque()  # recent: (played_at, user_id, difficulty, score), oldest first
+
+    @staticmethod
+    def _apply(boards, window, user_id, difficulty, score):
+        for board_difficulty in (ALL_DIFFICULTIES, difficulty):
+            board = boards.get((board_difficulty, window))
+            if board is not None:
+                board.add(user_id, score)
+
+    def _expire(self, boards, recent, now):
+        cutoff = now - WINDOWS["week"]
+        while recent and recent[0][0] < cutoff:
+            _, user_id, difficulty, score = recent.popleft()
+            self._apply(boards, "week", user_id, difficulty, -score)
+
+    def _add_game(self, boards, recent, user_id, difficulty, score, played_at, now):
+        self._apply(boards, "all", user_id, difficulty, score)
+        if played_at >= now - WINDOWS["week"]:
+            self._apply(boards, "week", user_id, difficulty, score)
+            recent.append((played_at, user_id, difficulty, score))
+
+    def record(self, rows):
+        """Add saved GameStats row dicts (user_id, difficulty, score, played_at)"""
+        now = datetime.utcnow()
+        with self._lock:
+            for row in rows:
+                self._add_game(self._boards, self._recent, row["user_id"], row["difficulty"],
+                               row.get("score") or 0, row["played_at"], now)
+            self._recorded += len(rows)
+            self._expire(self._boards, self._recent, now)
+
+    def sync(self, load_new):
+        """Record the games saved since the last sync or rebuild.
+
+        load_new(after_id) returns GameStats row dicts (id, user_id,
+        difficulty, score, played_at) with id above after_id, in id order.
+        """
+        with self._lock:
+            after_id = self._last_id
+        as_of = datetime.utcnow()
+        rows = load_new(after_id)
+        self.record(rows)
+        with self._lock:
+            if rows:
+                self._last_id = max(self._last_id, rows[-1]["id"])
+            self._as_of = as_of
+            self._syncs += 1
+
+    def rebuild(self, all_time_totals, recent_games, last_id=0):
+        """Replace every board from the database.
+
+        all_time_totals yields (user_id, difficulty, total_score) and
+        recent_games yields (user_id, difficulty, score, played_at) for the
+        last week in played_at order, both as of GameStats id last_id,
+        where the next sync() picks up. Scores are summed first and each
+        tree is then built in one pass.
+        """
+        start = time.perf_counter()
+        as_of = datetime.utcnow()
+        cutoff = datetime.utcnow() - WINDOWS["week"]
+        scores = {key: {} for key in self._empty()[0]}
+
+        def add(window, user_id, difficulty, score):
+            for board_difficulty in (ALL_DIFFICULTIES, difficulty):
+                board_scores = scores.get((board_difficulty, window))
+                if board_scores is not None:
+                    board_scores[user_id] = board_scores.get(user_id, 0) + score
+
+        for user_id, difficulty, total_score in all_time_totals:
+            add("all", user_id, difficulty, total_score or 0)
+        recent = deque()
+        for user_id, difficulty, score, played_at in recent_games:
+            if played_at >= cutoff:
+                add("week", user_id, difficulty, score or 0)
+                recent.append((played_at, user_id, difficulty, score or 0))
+
+        boards = {key: RankedBoard(board_scores) for key, board_scores in scores.items()}
+        with self._lock:
+            self._boards, self._recent = boards, recent
+            self._last_id = last_id
+            self._as_of = as_of
+            self._rebuilds += 1
+            self._last_rebuild_seconds = time.perf_counter() - start
+
+    def top(self, difficulty=ALL_DIFFICULTIES, window="all", n=10):
+        """Return [(rank, user_id, score), ...] for one board"""
+        with self._lock:
+            self._expire(self._boards, self._recent, datetime.utcnow())
+            return self._boards[(difficulty, window)].top(n)
+
+    def rank_of(self, user_id, difficulty=ALL_DIFFICULTIES, window="all"):
+        """Return (rank, score) on one board, or None if the user is unranked"""
+        with self._lock:
+            self._expire(self._boards, self._recent, datetime.utcnow())
+            return self._boards[(difficulty, window)].rank_of(user_id)
+
+    def size(self, difficulty=ALL_DIFFICULTIES, window="all"):
+        """Return the number of ranked users on one board"""
+        with self._lock:
+            return len(self._boards[(difficulty, window)])
+
+    def as_of(self):
+        """Return when the boards were last brought up to date with the database (UTC), or None"""
+        with self._lock:
+            return self._as_of
+
+    def start(self, load, load_new=None):
+        """Rebuild now, then sync every sync_interval and rebuild every rebuild_interval seconds.
+
+        load() returns rebuild()'s arguments and load_new is passed to
+        sync(); without it the boards are only rebuilt. An interval of 0
+        turns that step off.
+        """
+        self.rebuild(*load())
+        if self._thread is not None:
+            return
+        if load_new is None or self.sync_interval <= 0:
+            load_new = None
+            if self.rebuild_interval <= 0:
+                return
+        self._thread = threading.Thread(target=self._run, args=(load, load_new), name="leaderboard-sync", daemon=True)
+        self._thread.start()
+
+    def _run(self, load, load_new):
+        interval = self.sync_interval if load_new is not None else self.rebuild_interval
+        last_rebuild = time.monotonic()
+        while True:
+            time.sleep(interval)
+            rebuild_due = self.rebuild_interval > 0 and time.monotonic() - last_rebuild >= self.rebuild_interval
+            try:
+                if rebuild_due:
+                    last_rebuild = time.monotonic()
+                    self.rebuild(*load())
+                elif load_new is not None:
+                    self.sync(load_new)
+            except Exception as e:
+                print(f"Error {'rebuilding' if rebuild_due else 'syncing'} leaderboards: {e}")
+
+    def metrics(self):
+        """Return board sizes and rebuild statistics"""
+        with self._lock:
+            return {
+                "rebuild_interval": self.rebuild_interval,
+                "sync_interval": self.sync_interval,
+                "rebuilds": self._rebuilds,
+                "syncs": self._syncs,
+                "last_id": self._last_id,
+                "age_seconds": round((datetime.utcnow() - self._as_of).total_seconds(), 1) if self._as_of else None,
+                "last_rebuild_ms": round(self._last_rebuild_seconds * 1000, 2) if self._last_rebuild_seconds is not None else None,
+                "recorded_games": self._recorded,
+                "recent_games": len(self._recent),
+                "ranked_users": {f"{difficulty}/{window}": len(board) for (difficulty, window), board in self._boards.items()},
+            }
@@ -1,8 +1,11 @@
 import pandas as pd
 import random
-from backend.valid_pairs import VALID_PAIRS
+from answer_index import NameIndex, normalize_name
+from player_store import PlayerStore, ValidPairsView
 
 df = pd.read_csv("cleaned_players.csv")
+store = PlayerStore.from_csv("cleaned_players.csv")
+VALID_PAIRS = ValidPairsView(store)
 
 def makeGuess (guess):
     #make a guess function that intakes a users guess
@@ -113,6 +116,9 @@ name_to_ids = defaultdict(list)
 for pid, info in player_dict.items():
     name_to_ids[info["name"]].append(pid)
 
+# Normalized guess lookup per (club, country) cell
+name_index = NameIndex(store)
+
 # Loop until all cells are guessed
 while len(guessed) < 9:
     print("\n--- Grid ---")
@@ -138,32 +144,15 @@ while len(guessed) < 9:
         print("❌ That club-country combo is not in the grid. Try again.")
         continue
 
-    key = (country_guess, club_guess)
-    valid_names = VALID_PAIRS.get(key, [])
-
-    # Normalize user guess
-    guess = player_guess.strip().lower()
+    # Single lookup covers both full-name and partial (surname) guesses
+    match = name_index.match(club_guess, country_guess, player_guess)
+    if match is None:
+        print("❌ Incorrect. Try again.")
+        continue
 
-    # Step 1: Check full name match
-    for name in valid_names:
-        if guess == name.lower():
-            guessed[(club_guess, country_guess)] = name
-            print("✅ Correct! (full name match)")
-            break
+    _, name = match
+    guessed[(club_guess, country_guess)] = name
+    if normalize_name(player_guess) == normalize_name(name):
+        print("✅ Correct! (full name match)")
     else:
-        # Step 2: Check partial match (everything except the first word)
-        matched = False
-        for name in valid_names:
-            parts = name.split()
-            if len(parts) == 1:
-                partial = parts[0].lower()
-            else:
-                partial = " ".join(parts[1:]).lower()
-            if guess == partial:
-                guessed[(club_guess, country_guess)] = name
-                print(f"✅ Correct! (matched partial: {name})")
-                matched = True
-                break
-
-        if not matched:
-            print("❌ Incorrect. Try again.")
+        print(f"✅ Correct! (matched partial: {name})")
@@ -0,0 +1,79 @@
+"""
+Schema migrations for Tiki Taka Toe
+db.create_all() only creates missing tables, so changes to existing tables
+(new indexes, backfills) are applied here, in order, exactly once per database
+"""
+
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from models import db
+from stats_rollup import rebuild_rollups
+
+schema_migrations = db.Table(
+    'schema_migrations',
+    db.Column('version', db.Integer, primary_key=True),
+    db.Column('name', db.String(100), nullable=False),
+    db.Column('applied_at', db.DateTime, nullable=False),
+)
+
+
+def create_index(name, table, columns):
+    """Return a migration step creating an index if it does not exist (SQLite and Postgres)"""
+    def step():
+        db.session.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"))
+    return step
+
+
+def backfill_stats_rollups():
+    """Build user_stats_summary for databases that had games before the rollup existed"""
+    rebuild_rollups()
+
+
+# (version, name, step); append new migrations with the next version number and never edit old ones
+MIGRATIONS = [
+    (1, "index user_sessions.expires_at", create_index('ix_user_sessions_expires_at', 'user_sessions', ['expires_at'])),
+    (2, "index user_sessions.user_id", create_index('ix_user_sessions_user_id', 'user_sessions', ['user_id'])),
+    (3, "index game_stats (user_id, played_at)",
+     create_index('ix_game_stats_user_id_played_at', 'game_stats', ['user_id', 'played_at'])),
+    (4, "index revoked_tokens.expires_at", create_index('ix_revoked_tokens_expires_at', 'revoked_tokens', ['expires_at'])),
+    (5, "backfill user_stats_summary", backfill_stats_rollups),
+    (6, "index game_stats.played_at", create_index('ix_game_stats_played_at', 'game_stats', ['played_at'])),
+]
+
+
+def applied_versions():
+    """Return the set of migration versions recorded in this database"""
+    return {version for (version,) in db.session.execute(db.select(schema_migrations.c.version))}
+
+
+def run_migrations():
+    """Apply pending migrations in order (call inside an app context, after db.create_all()).
+
+    Each migration claims its version row and runs in the same transaction,
+    so when several workers start at once exactly one of them applies it and
+    the others skip it once the winner commits. Returns the versions applied.
+    """
+    schema_migrations.create(db.engine, checkfirst=True)
+    done = applied_versions()
+    applied = []
+    for version, name, step in MIGRATIONS:
+        if version in done:
+            continue
+        try:
+            db.session.execute(schema_migrations.insert().values(
+                version=version, name=name, applied_at=datetime.utcnow()))
+        except IntegrityError:
+            db.session.rollback()  # Another worker applied it first
+            continue
+        try:
+            step()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        print(f"Applied migration {version}: {name}")
+        applied.append(version)
+    return applied
@@ -1,6 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
-import bcrypt
+from password_hasher import password_hasher
 
 db = SQLAlchemy()
 
@@ -19,12 +19,15 @@ class User(db.Model):
     
     def set_password(self, password):
         """Hash and set the user's password"""
-        salt = bcrypt.gensalt()
-        self.password_hash = bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
         """Check if the provided password matches the stored hash"""
-        return bcrypt.checkpw(password.encode('utf-8'), self.password_hash.encode('utf-8'))
+        return password_hasher.verify(password, self.password_hash)
+    
+    def password_needs_rehash(self):
+        """Check if the stored hash uses a different bcrypt cost than configured"""
+        return password_hasher.needs_rehash(self.password_hash)
     
     def to_dict(self):
         """Convert user object to dictionary (excluding sensitive data)"""
@@ -38,6 +41,12 @@ class User(db.Model):
 
 class GameStats(db.Model):
     __tablename__ = 'game_stats'
+    __table_args__ = (
+        # A user's games, newest first (/auth/stats recent games)
+        db.Index('ix_game_stats_user_id_played_at', 'user_id', 'played_at'),
+        # Games in a time window (weekly leaderboard rebuilds)
+        db.Index('ix_game_stats_played_at', 'played_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -69,13 +78,33 @@ class UserSession(db.Model):
     __tablename__ = 'user_sessions'
     
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     session_token = db.Column(db.String(255), unique=True, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    expires_at = db.Column(db.DateTime, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)  # Scanned by the session sweeper
     
     def is_expired(self):
         """Check if the session has expired"""
         return datetime.utcnow() > self.expires_at
 
 
+
+class RevokedToken(db.Model):
+    __tablename__ = 'revoked_tokens'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    token_id = db.Column(db.String(64), unique=True, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)  # Row can be dropped after this
+
+# Running totals of each user's GameStats per difficulty, maintained by stats_rollup.py
+class UserStatsSummary(db.Model):
+    __tablename__ = 'user_stats_summary'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    difficulty = db.Column(db.String(20), primary_key=True)
+    games_played = db.Column(db.Integer, nullable=False, default=0)
+    games_completed = db.Column(db.Integer, nullable=False, default=0)
+    total_score = db.Column(db.Integer, nullable=False, default=0)
+    total_hints_used = db.Column(db.Integer, nullable=False, default=0)
+    total_hint_penalty = db.Column(db.Integer, nullable=False, default=0)
+    best_time = db.Column(db.Integer)  # Fastest completed game in seconds, None until one is completed
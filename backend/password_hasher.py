@@ -0,0 +1,107 @@
+"""
+Password hashing for Tiki Taka Toe
+Runs bcrypt in the calling request thread, with a cap on how many hashes a
+worker computes at once so a burst of logins cannot take over every request
+thread in a threaded worker
+"""
+
+import threading
+import time
+
+import bcrypt
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many hash operations are already waiting"""
+
+
+class PasswordHasher:
+    """bcrypt with a configurable cost, at most max_workers hashes at a time.
+
+    Each hash runs inline in the calling thread once it gets one of
+    max_workers slots. At most max_pending operations may be waiting or
+    running at once; callers beyond that wait up to queue_timeout seconds
+    (by default not at all) and then get PasswordHasherBusy. bcrypt
+    releases the GIL, so game requests on other threads keep running while
+    a hash is computed.
+
+    This is what keeps a login burst from starving game requests in a
+    threaded worker (the Procfile runs gunicorn's gthread workers): with
+    max_pending below the worker's thread count, logins can never occupy
+    every request thread, and only max_workers of them use a CPU at once.
+    """
+
+    def __init__(self, rounds=12, max_workers=1, max_pending=4, queue_timeout=0.0):
+        self.queue_timeout = queue_timeout
+        self._metrics_lock = threading.Lock()
+        self._hashed = 0
+        self._verified = 0
+        self._busy = 0
+        self._wait_seconds = 0.0
+        self._work_seconds = 0.0
+        self.configure(rounds, max_workers, max_pending)
+
+    def configure(self, rounds, max_workers, max_pending):
+        """Set the bcrypt cost and concurrency limits (call before serving requests)"""
+        self.rounds = rounds
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._workers = threading.BoundedSemaphore(max_workers)
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._metrics_lock:
+                self._busy += 1
+            raise PasswordHasherBusy("Too many password operations in progress")
+        try:
+            submitted = time.perf_counter()
+            with self._workers:
+                started = time.perf_counter()
+                result = fn(*args)
+                finished = time.perf_counter()
+        finally:
+            self._slots.release()
+        with self._metrics_lock:
+            self._wait_seconds += started - submitted
+            self._work_seconds += finished - started
+        return result
+
+    def hash(self, password):
+        """Return a bcrypt hash of password at the configured cost"""
+        hashed = self._run(lambda: bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(self.rounds)))
+        with self._metrics_lock:
+            self._hashed += 1
+        return hashed.decode('utf-8')
+
+    def verify(self, password, password_hash):
+        """Check password against a bcrypt hash"""
+        matches = self._run(bcrypt.checkpw, password.encode('utf-8'), password_hash.encode('utf-8'))
+        with self._metrics_lock:
+            self._verified += 1
+        return matches
+
+    def needs_rehash(self, password_hash):
+        """True when a hash was made with a different cost than the configured one"""
+        # bcrypt hashes look like $2b$12$<salt+hash>
+        parts = password_hash.split('$')
+        return len(parts) < 4 or not parts[2].isdigit() or int(parts[2]) != self.rounds
+
+    def metrics(self):
+        """Return operation counts and average queue wait and work time"""
+        with self._metrics_lock:
+            operations = self._hashed + self._verified
+            return {
+                "rounds": self.rounds,
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "hashed": self._hashed,
+                "verified": self._verified,
+                "rejected_busy": self._busy,
+                "wait_ms_avg": round(self._wait_seconds / operations * 1000, 2) if operations else None,
+                "work_ms_avg": round(self._work_seconds / operations * 1000, 2) if operations else None,
+            }
+
+
+# Shared by every User; configured from the environment by app.py
+password_hasher = PasswordHasher()
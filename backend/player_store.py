@@ -0,0 +1,204 @@
+"""
+Compact player store for Tiki Taka Toe
+Columnar, interned representation of cleaned_players.csv
+"""
+
+import csv
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+
+
+class PlayerStore:
+    """Read-only columnar store of players, their country and the clubs they played for.
+
+    Team and country names are interned into small integer codes, each player's
+    name is stored once in a UTF-8 blob, and club membership and (club, country)
+    cells are flat arrays addressed through offset tables. Players are numbered
+    by "row" in the order they first appear in the dataset.
+    """
+
+    def __init__(self, teams, countries, player_ids, id_order, name_blob, name_offsets,
+                 player_countries, club_offsets, club_codes, cell_keys, cell_offsets, cell_rows):
+        self.teams = teams
+        self.countries = countries
+        self.team_codes = {team: code for code, team in enumerate(teams)}
+        self.country_codes = {country: code for code, country in enumerate(countries)}
+
+        self.player_ids = player_ids              # row -> player_id
+        self.id_order = id_order                  # rows sorted by player_id
+        self.name_blob = name_blob                # all names, UTF-8, back to back
+        self.name_offsets = name_offsets          # row -> start in name_blob (len rows + 1)
+        self.player_countries = player_countries  # row -> country code
+        self.club_offsets = club_offsets          # row -> start in club_codes (len rows + 1)
+        self.club_codes = club_codes              # team codes, grouped by row
+        self.cell_keys = cell_keys                # sorted team_code * len(countries) + country_code
+        self.cell_offsets = cell_offsets          # cell -> start in cell_rows (len cells + 1)
+        self.cell_rows = cell_rows                # player rows, grouped by cell in dataset order
+
+    @classmethod
+    def from_csv(cls, path):
+        """Build a store from a cleaned_players.csv file"""
+        player_ids = []
+        names = []
+        player_country_names = []
+        player_teams = []
+        row_of = {}
+
+        with open(path, newline="", encoding="utf-8") as f:
+            for record in csv.DictReader(f):
+                player_id = int(record["player_id"])
+                row = row_of.get(player_id)
+                if row is None:
+                    row = row_of[player_id] = len(player_ids)
+                    player_ids.append(player_id)
+                    names.append(record["name"])
+                    player_country_names.append(record["country"])
+                    player_teams.append([])
+                if record["team"] not in player_teams[row]:
+                    player_teams[row].append(record["team"])
+
+        return cls.from_players(player_ids, names, player_country_names, player_teams)
+
+    @classmethod
+    def from_players(cls, player_ids, names, countries_of, teams_of):
+        """Build a store from parallel per-player lists (teams_of holds a list per player)"""
+        teams = sorted({team for player_teams in teams_of for team in player_teams})
+        countries = sorted(set(countries_of))
+        team_codes = {team: code for code, team in enumerate(teams)}
+        country_codes = {country: code for code, country in enumerate(countries)}
+
+        name_offsets = array("I", [0])
+        encoded = []
+        for name in names:
+            data = name.encode("utf-8")
+            encoded.append(data)
+            name_offsets.append(name_offsets[-1] + len(data))
+
+        player_countries = array("H", (country_codes[c] for c in countries_of))
+        club_offsets = array("I", [0])
+        club_codes = array("H")
+        cells = {}
+        for row, player_teams in enumerate(teams_of):
+            for team in player_teams:
+                club_codes.append(team_codes[team])
+                key = team_codes[team] * len(countries) + player_countries[row]
+                cells.setdefault(key, []).append(row)
+            club_offsets.append(len(club_codes))
+
+        cell_keys = array("I", sorted(cells))
+        cell_offsets = array("I", [0])
+        cell_rows = array("I")
+        for key in cell_keys:
+            cell_rows.extend(cells[key])
+            cell_offsets.append(len(cell_rows))
+
+        return cls(
+            teams=teams,
+            countries=countries,
+            player_ids=array("I", player_ids),
+            id_order=array("I", sorted(range(len(player_ids)), key=player_ids.__getitem__)),
+            name_blob=b"".join(encoded),
+            name_offsets=name_offsets,
+            player_countries=player_countries,
+            club_offsets=club_offsets,
+            club_codes=club_codes,
+            cell_keys=cell_keys,
+            cell_offsets=cell_offsets,
+            cell_rows=cell_rows,
+        )
+
+    def __len__(self):
+        return len(self.player_ids)
+
+    # === Per-player access ===
+    def row_of(self, player_id):
+        """Return the row for a player_id, or None if the player is unknown"""
+        i = bisect_left(self.id_order, player_id, key=self.player_ids.__getitem__)
+        if i < len(self.id_order) and self.player_ids[self.id_order[i]] == player_id:
+            return self.id_order[i]
+        return None
+
+    def name_at(self, row):
+        """Return the name of the player at a row"""
+        return bytes(self.name_blob[self.name_offsets[row]:self.name_offsets[row + 1]]).decode("utf-8")
+
+    def country_at(self, row):
+        """Return the country of the player at a row"""
+        return self.countries[self.player_countries[row]]
+
+    def clubs_at(self, row):
+        """Return the clubs of the player at a row"""
+        return [self.teams[code] for code in self.club_codes[self.club_offsets[row]:self.club_offsets[row + 1]]]
+
+    def name_of(self, player_id):
+        """Return a player's name by id, or None if the player is unknown"""
+        row = self.row_of(player_id)
+        return None if row is None else self.name_at(row)
+
+    # === Per-cell access ===
+    def _cell_index(self, club, country):
+        team_code = self.team_codes.get(club)
+        country_code = self.country_codes.get(country)
+        if team_code is None or country_code is None:
+            return None
+        key = team_code * len(self.countries) + country_code
+        i = bisect_left(self.cell_keys, key)
+        if i < len(self.cell_keys) and self.cell_keys[i] == key:
+            return i
+        return None
+
+    def cell_rows_for(self, club, country):
+        """Return the player rows answering a (club, country) cell, in dataset order"""
+        i = self._cell_index(club, country)
+        if i is None:
+            return ()
+        return self.cell_rows[self.cell_offsets[i]:self.cell_offsets[i + 1]]
+
+    def has_cell(self, club, country):
+        """Return True if at least one player answers a (club, country) cell"""
+        return self._cell_index(club, country) is not None
+
+    def candidates(self, club, country):
+        """Return [(player_id, name), ...] answering a cell, in dataset order"""
+        return [(self.player_ids[row], self.name_at(row)) for row in self.cell_rows_for(club, country)]
+
+    def cells(self):
+        """Yield (club, country, rows) for every non-empty cell"""
+        n_countries = len(self.countries)
+        for i, key in enumerate(self.cell_keys):
+            team_code, country_code = divmod(key, n_countries)
+            rows = self.cell_rows[self.cell_offsets[i]:self.cell_offsets[i + 1]]
+            yield self.teams[team_code], self.countries[country_code], rows
+
+
+class ValidPairsView(Mapping):
+    """Read-only (country, club) -> [player names] mapping derived from a PlayerStore.
+
+    Drop-in replacement for the generated data/valid_pairs.py literal. Name
+    lists are decoded on access rather than held in memory.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def __getitem__(self, key):
+        country, club = key
+        rows = self.store.cell_rows_for(club, country)
+        if not len(rows):
+            raise KeyError(key)
+        return [self.store.name_at(row) for row in rows]
+
+    def __contains__(self, key):
+        try:
+            country, club = key
+        except (TypeError, ValueError):
+            return False
+        return self.store.has_cell(club, country)
+
+    def __iter__(self):
+        for club, country, _ in self.store.cells():
+            yield country, club
+
+    def __len__(self):
+        return len(self.store.cell_keys)
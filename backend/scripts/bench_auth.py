@@ -0,0 +1,167 @@
+import contextlib
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+# Make the backend modules importable when run from any directory
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+
+import requests
+
+ROUNDS = int(sys.argv[1]) if len(sys.argv) > 1 else 12
+DURATION = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+LOGIN_THREADS = 8
+# gunicorn worker settings to compare: the old sync workers and the Procfile's threaded workers
+GUNICORN_CONFIGS = (
+    ("gunicorn -w 2 (sync workers)", ["-w", "2"]),
+    ("gunicorn -w 2 -k gthread --threads 8 (Procfile)", ["-w", "2", "-k", "gthread", "--threads", "8"]),
+)
+
+# A throwaway database so the benchmark never touches real users
+TMP_DIR = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(TMP_DIR, "bench_auth.db")
+os.environ["GAME_STORE_URL"] = "sqlite:///" + os.path.join(TMP_DIR, "games.db")
+os.environ["IMAGE_CACHE_PATH"] = os.path.join(TMP_DIR, "image_cache.db")
+os.environ["STATS_SPILL_PATH"] = os.path.join(TMP_DIR, "stats_spill.jsonl")
+os.environ["BCRYPT_ROUNDS"] = str(ROUNDS)
+
+from app import app, password_hasher  # noqa: E402
+
+CREDENTIALS = {"username": "bench", "password": "bench-password"}
+
+
+def percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def measure(login, game, login_threads):
+    """Run game() repeatedly for DURATION seconds while login_threads threads call login(); return (timings, logins)"""
+    stop = threading.Event()
+    statuses = []
+
+    def login_loop():
+        while not stop.is_set():
+            status = login()
+            statuses.append(status)
+            if status == 503:
+                time.sleep(0.1)  # a real client backs off when the server is busy
+
+    threads = [threading.Thread(target=login_loop, daemon=True) for _ in range(login_threads)]
+    # Silence the per-request debug prints from the game endpoints
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for thread in threads:
+            thread.start()
+        timings = []
+        end = time.perf_counter() + DURATION
+        n = 0
+        while time.perf_counter() < end:
+            start = time.perf_counter()
+            game(n)
+            timings.append((time.perf_counter() - start) * 1000)
+            n += 1
+        stop.set()
+        for thread in threads:
+            thread.join()
+    timings.sort()
+    return timings, sum(1 for status in statuses if status == 200)
+
+
+def print_row(label, timings, logins):
+    print(f"  {label:<26} game p50 {percentile(timings, 50):8.2f} ms   p99 {percentile(timings, 99):8.2f} ms   "
+          f"logins/sec {logins / DURATION:6.1f}")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+client = app.test_client()
+client.post("/auth/register", json=CREDENTIALS)
+
+print(f"bcrypt cost {ROUNDS}, {os.cpu_count()} CPU core(s)\n")
+
+start = time.perf_counter()
+verifications = 0
+password_hash = password_hasher.hash("bench-password")
+while time.perf_counter() - start < DURATION / 2:
+    password_hasher.verify("bench-password", password_hash)
+    verifications += 1
+elapsed = time.perf_counter() - start
+print(f"Single-thread verify: {verifications / elapsed:.1f} logins/sec per core "
+      f"({elapsed / verifications * 1000:.1f} ms each)\n")
+
+
+def bench_gunicorn(title, args):
+    """Game endpoint latency over HTTP against a real gunicorn, without and with a login burst"""
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", *args, "-b", f"127.0.0.1:{port}", "app:app"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.perf_counter() + 60
+        while True:
+            try:
+                requests.get(f"{base}/metrics", timeout=1)
+                break
+            except requests.RequestException:
+                if time.perf_counter() > deadline or server.poll() is not None:
+                    sys.exit("❌ gunicorn did not start")
+                time.sleep(0.2)
+        http = threading.local()
+
+        def session():
+            if not hasattr(http, "session"):
+                http.session = requests.Session()
+            return http.session
+
+        print(f"{title}: game endpoint latency over HTTP, {DURATION:.0f}s each")
+        for label, login_threads in (("no logins", 0), (f"{LOGIN_THREADS} clients logging in", LOGIN_THREADS)):
+            timings, logins = measure(
+                lambda: session().post(f"{base}/auth/login", json=CREDENTIALS, timeout=60).status_code,
+                lambda n: session().get(f"{base}/generate-grid?difficulty=medium&game_id=http-{label[0]}-{n}",
+                                        timeout=60),
+                login_threads,
+            )
+            print_row(label, timings, logins)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+# 1. Real gunicorn workers. A sync worker serves one request at a time, so a login holds the whole
+# process for one hash and game requests queue behind it. A gthread worker keeps serving game requests
+# on its other threads, because BCRYPT_MAX_PENDING keeps logins below the thread count.
+for title, args in GUNICORN_CONFIGS:
+    bench_gunicorn(title, args)
+    print()
+
+# 2. A threaded worker (gunicorn --threads, or the development server): logins and game requests share
+# one process, and BCRYPT_WORKERS caps how many hashes run at once
+print(f"One threaded worker: game endpoint latency while {LOGIN_THREADS} threads log in, {DURATION:.0f}s each")
+for label, concurrent_hashes in (("no logins", 0), ("1 hash at a time", 1), (f"{LOGIN_THREADS} hashes at a time", LOGIN_THREADS)):
+    if concurrent_hashes:
+        password_hasher.configure(ROUNDS, concurrent_hashes, max_pending=64)
+    login_client = threading.local()
+
+    def login():
+        if not hasattr(login_client, "client"):
+            login_client.client = app.test_client()
+        return login_client.client.post("/auth/login", json=CREDENTIALS).status_code
+
+    def game(n):
+        client.get(f"/generate-grid?difficulty=medium&game_id=bench-{label[0]}-{n}")
+        client.get(f"/game-state/bench-{label[0]}-{n}")
+
+    timings, logins = measure(login, game, LOGIN_THREADS if concurrent_hashes else 0)
+    print_row(label, timings, logins)
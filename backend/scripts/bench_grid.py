@@ -0,0 +1,60 @@
+import os
+import random
+import sys
+import time
+
+# Make the backend modules importable when run from any directory
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from difficulty import DIFFICULTY_POOLS
+from grid_generator import GridGenerator
+from player_store import PlayerStore, ValidPairsView
+
+CSV_PATH = os.path.join(BACKEND_DIR, "data", "cleaned_players.csv")
+RUNS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+
+def legacy_generate_grid(valid_pairs_view, clubs, countries):
+    """The previous rejection-sampling generator, kept here for comparison"""
+    valid_pairs = set(valid_pairs_view.keys())
+    valid_clubs = [club for club in clubs if any((c, club) in valid_pairs for c in countries)]
+    valid_countries = [c for c in countries if any((c, club) in valid_pairs for club in clubs)]
+    if len(valid_clubs) < 3 or len(valid_countries) < 3:
+        return None, None
+    for _ in range(100):
+        selected_clubs = random.sample(valid_clubs, 3)
+        selected_countries = random.sample(valid_countries, 3)
+        if all((c, club) in valid_pairs for club in selected_clubs for c in selected_countries):
+            return selected_clubs, selected_countries
+    return None, None
+
+
+def percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run(label, generate, clubs, countries):
+    timings = []
+    failures = 0
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        selected_clubs, _ = generate(clubs, countries)
+        timings.append((time.perf_counter() - start) * 1000)
+        if selected_clubs is None:
+            failures += 1
+    timings.sort()
+    print(f"  {label:<8} p50 {percentile(timings, 50):7.3f} ms   p99 {percentile(timings, 99):7.3f} ms   "
+          f"failures {failures}/{RUNS} ({failures / RUNS:.1%})")
+
+
+store = PlayerStore.from_csv(CSV_PATH)
+valid_pairs = ValidPairsView(store)
+generator = GridGenerator(store)
+
+print(f"Grid generation, {RUNS} runs per difficulty\n")
+for difficulty, (clubs, countries) in DIFFICULTY_POOLS.items():
+    print(difficulty)
+    run("legacy", lambda cl, co: legacy_generate_grid(valid_pairs, cl, co), clubs, countries)
+    run("bitset", generator.generate, clubs, countries)
@@ -0,0 +1,75 @@
+import gc
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Make the backend modules importable when run from any directory
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from leaderboard import ALL_DIFFICULTIES, Leaderboards
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+USERS = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+QUERIES = 5000
+DIFFICULTIES = ("easy", "medium", "hard")
+
+
+def percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def timed(label, fn, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    print(f"  {label:<34} p50 {percentile(timings, 50):8.3f} ms   p99 {percentile(timings, 99):8.3f} ms")
+
+
+rng = random.Random(42)
+now = datetime.utcnow()
+print(f"Generating {ROWS:,} synthetic games for {USERS:,} users over 60 days...")
+games = [(rng.randint(1, USERS), rng.choice(DIFFICULTIES), rng.randint(0, 900),
+          now - timedelta(seconds=rng.randint(0, 60 * 86400))) for _ in range(ROWS)]
+
+# What a rebuild reads from the database: per-user rollup totals and the last week's games
+totals = {}
+for user_id, difficulty, score, _ in games:
+    totals[(user_id, difficulty)] = totals.get((user_id, difficulty), 0) + score
+all_time_totals = [(user_id, difficulty, score) for (user_id, difficulty), score in totals.items()]
+week_ago = now - timedelta(days=7)
+recent_games = sorted(((user_id, difficulty, score, played_at) for user_id, difficulty, score, played_at in games
+                       if played_at >= week_ago), key=lambda game: game[3])
+
+# The synthetic rows stand in for the database and would not be on a worker's heap; keep them out of GC scans
+gc.freeze()
+
+boards = Leaderboards(DIFFICULTIES, rebuild_interval=0)
+start = time.perf_counter()
+boards.rebuild(all_time_totals, recent_games)
+print(f"Rebuild from {len(all_time_totals):,} rollups + {len(recent_games):,} recent games: "
+      f"{time.perf_counter() - start:.2f}s, {boards.size():,} ranked users\n")
+
+print(f"Order-statistics leaderboards, {QUERIES} operations each")
+new_game = lambda: boards.record([{"user_id": rng.randint(1, USERS), "difficulty": rng.choice(DIFFICULTIES),
+                                   "score": rng.randint(0, 900), "played_at": datetime.utcnow()}])
+timed("record one game", new_game, QUERIES)
+timed("top 10, global all-time", lambda: boards.top(ALL_DIFFICULTIES, "all", 10), QUERIES)
+timed("top 10, hard this week", lambda: boards.top("hard", "week", 10), QUERIES)
+timed("rank of a user, global all-time", lambda: boards.rank_of(rng.randint(1, USERS)), QUERIES)
+timed("rank of a user, easy this week", lambda: boards.rank_of(rng.randint(1, USERS), "easy", "week"), QUERIES)
+
+# Baseline: rank straight from per-user totals, which is already cheaper than scanning raw GameStats
+user_totals = {}
+for (user_id, _), score in totals.items():
+    user_totals[user_id] = user_totals.get(user_id, 0) + score
+print("\nScan-and-sort over per-user totals, 20 operations each")
+timed("top 10, global all-time", lambda: sorted(user_totals.items(), key=lambda item: -item[1])[:10], 20)
+timed("rank of a user, global all-time",
+      lambda: 1 + sum(1 for score in user_totals.values() if score > user_totals.get(rng.randint(1, USERS), 0)), 20)
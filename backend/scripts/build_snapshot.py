@@ -0,0 +1,27 @@
+import os
+import sys
+import time
+
+# Make the backend modules importable when run from any directory
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from player_store import PlayerStore
+from snapshot import load_snapshot, write_snapshot
+
+CSV_PATH = os.path.join(BACKEND_DIR, "data", "cleaned_players.csv")
+SNAPSHOT_PATH = os.path.join(BACKEND_DIR, "data", "players.snapshot")
+
+# Build the store from the CSV and write it out
+store = PlayerStore.from_csv(CSV_PATH)
+write_snapshot(store, CSV_PATH, SNAPSHOT_PATH)
+
+# Load it back to make sure the file is valid
+start = time.perf_counter()
+loaded = load_snapshot(SNAPSHOT_PATH, CSV_PATH)
+elapsed_ms = (time.perf_counter() - start) * 1000
+
+print(f"✅ Wrote {SNAPSHOT_PATH} ({os.path.getsize(SNAPSHOT_PATH) / 1024:.0f} KB)")
+print(f"   {len(loaded)} players, {len(loaded.teams)} clubs, {len(loaded.countries)} countries, "
+      f"{len(loaded.cell_keys)} club/country pairs")
+print(f"   Snapshot loads in {elapsed_ms:.1f} ms")
@@ -0,0 +1,56 @@
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import timedelta
+
+# Make the backend modules importable when run from any directory
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+
+# A throwaway database in the default session mode
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "check_auth_tokens.db")
+os.environ["AUTH_TOKEN_MODE"] = "session"
+os.environ.pop("SECRET_KEY", None)
+
+from app import app, DEFAULT_SECRET_KEY  # noqa: E402
+from models import db  # noqa: E402
+from signed_tokens import issue_token  # noqa: E402
+
+failures = 0
+
+
+def report(ok, message):
+    global failures
+    if not ok:
+        failures += 1
+    print(f"{'✅' if ok else '❌'} {message}")
+
+
+with app.app_context():
+    db.create_all()
+client = app.test_client()
+client.post("/auth/register", json={"username": "alice", "password": "secret1"})
+login = client.post("/auth/login", json={"username": "alice", "password": "secret1"}).get_json()
+user_id = login["user"]["id"]
+
+status = client.get("/auth/profile", headers={"Authorization": f"Bearer {login['session_token']}"}).status_code
+report(status == 200, f"a real session token is accepted ({status})")
+
+for label, key in (("the default SECRET_KEY", DEFAULT_SECRET_KEY), ("the app's own SECRET_KEY", app.config["SECRET_KEY"])):
+    forged = issue_token(key, user_id, timedelta(days=1))
+    status = client.get("/auth/profile", headers={"Authorization": f"Bearer {forged}"}).status_code
+    report(status == 401, f"session mode rejects a signed token made with {label} ({status})")
+
+# Signed mode must not start with the published default key
+env = {key: value for key, value in os.environ.items() if key != "SECRET_KEY"}
+env["AUTH_TOKEN_MODE"] = "signed"
+result = subprocess.run([sys.executable, "-c", "import app"], cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+report(result.returncode != 0 and "SECRET_KEY" in result.stderr,
+       "AUTH_TOKEN_MODE=signed refuses to start without a SECRET_KEY")
+
+if failures:
+    print(f"\n❌ {failures} auth token checks failed")
+    sys.exit(1)
+print("\n✅ Forged tokens are rejected")
@@ -0,0 +1,177 @@
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Make the backend modules importable when run from any directory
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import requests
+
+from http_client import HTTPClient
+from image_search import ImageCache, ImageSearch, SEARCH_VARIANTS
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Local stand-in for the image API: keep-alive, optional delay via ?sleep=<seconds>"""
+
+    protocol_version = "HTTP/1.1"
+    lock = threading.Lock()
+    connections = 0
+    open_connections = 0
+    peak_connections = 0
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes; without this, Nagle stalls every keep-alive response
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with StubHandler.lock:
+            StubHandler.connections += 1
+            StubHandler.open_connections += 1
+            StubHandler.peak_connections = max(StubHandler.peak_connections, StubHandler.open_connections)
+
+    def finish(self):
+        with StubHandler.lock:
+            StubHandler.open_connections -= 1
+        super().finish()
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        time.sleep(float(query.get("sleep", ["0"])[0]))
+        body = json.dumps({"Image": f"https://img.example/{query.get('q', [''])[0]}.png"}).encode()
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except OSError:
+            pass  # client gave up (read timeout)
+
+    @classmethod
+    def reset(cls):
+        with cls.lock:
+            cls.connections = 0
+            cls.peak_connections = cls.open_connections
+
+
+server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+server.daemon_threads = True
+threading.Thread(target=server.serve_forever, daemon=True).start()
+URL = f"http://127.0.0.1:{server.server_port}/"
+failures = 0
+
+
+def report(ok, message):
+    global failures
+    if not ok:
+        failures += 1
+    print(f"{'✅' if ok else '❌'} {message}")
+
+
+def timed_calls(fn, count):
+    start = time.perf_counter()
+    for i in range(count):
+        fn(i)
+    return (time.perf_counter() - start) * 1000 / count
+
+
+print(f"Stub server on {URL}\n")
+
+# 1. Sequential calls share one keep-alive connection; unpooled requests.get opens one each
+REQUESTS = 50
+StubHandler.reset()
+ms = timed_calls(lambda i: requests.get(URL, params={"q": i}, timeout=5).json(), REQUESTS)
+unpooled = StubHandler.connections
+print(f"  requests.get:      {REQUESTS} calls, {unpooled} connections, {ms:.2f} ms/call")
+
+client = HTTPClient(max_per_host=4, connect_timeout=1, read_timeout=5)
+StubHandler.reset()
+ms = timed_calls(lambda i: client.get(URL, params={"q": i}).json(), REQUESTS)
+pooled = StubHandler.connections
+print(f"  HTTPClient.get:    {REQUESTS} calls, {pooled} connections, {ms:.2f} ms/call")
+report(pooled == 1 and client.connections_opened() == 1,
+       f"sequential calls reuse one connection ({pooled} opened, {unpooled} without pooling)")
+
+# 2. Concurrent callers never open more than max_per_host connections to one host
+StubHandler.reset()
+with ThreadPoolExecutor(max_workers=16) as executor:
+    list(executor.map(lambda i: client.get(URL, params={"q": i, "sleep": 0.02}).json(), range(64)))
+report(StubHandler.peak_connections <= client.max_per_host and client.connections_opened() <= client.max_per_host,
+       f"16 threads stay within {client.max_per_host} connections per host "
+       f"(peak {StubHandler.peak_connections} open, {client.connections_opened()} opened in total)")
+
+# 3. A slow upstream trips the read timeout instead of holding the caller
+slow_client = HTTPClient(max_per_host=2, connect_timeout=1, read_timeout=0.3)
+start = time.perf_counter()
+try:
+    slow_client.get(URL, params={"q": "slow", "sleep": 2})
+    report(False, "read timeout: slow response was returned")
+except requests.ReadTimeout:
+    elapsed = time.perf_counter() - start
+    report(elapsed < 1.0 and slow_client.metrics()["timeouts"] == 1,
+           f"read timeout fires after {elapsed:.2f}s against a 2s response")
+try:
+    slow_client.get(URL, params={"q": "fast"}).json()
+    report(True, "the pool recovers after a timed-out request")
+except requests.RequestException as e:
+    report(False, f"the pool recovers after a timed-out request: {e}")
+
+# 4. A host that never completes the handshake trips the connect timeout.
+# A listener with a full backlog that never accepts drops further SYNs, so connects hang.
+listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+listener.bind(("127.0.0.1", 0))
+listener.listen(0)
+backlog = []
+for _ in range(8):
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.setblocking(False)
+    s.connect_ex(listener.getsockname())
+    backlog.append(s)
+time.sleep(0.1)
+blackhole = f"http://127.0.0.1:{listener.getsockname()[1]}/"
+connect_client = HTTPClient(max_per_host=1, connect_timeout=0.3, read_timeout=5)
+start = time.perf_counter()
+try:
+    connect_client.get(blackhole)
+    report(False, "connect timeout: request to a non-accepting host succeeded")
+except requests.ConnectTimeout:
+    elapsed = time.perf_counter() - start
+    report(elapsed < 1.0, f"connect timeout fires after {elapsed:.2f}s against a host that never accepts")
+except requests.ReadTimeout:
+    # The kernel finished the handshake anyway; the read timeout still bounded the call
+    elapsed = time.perf_counter() - start
+    report(elapsed < 6.0, f"connect timeout not reachable here; call bounded by the read timeout ({elapsed:.2f}s)")
+for s in backlog:
+    s.close()
+listener.close()
+
+# 5. Image lookups go through the pooled client
+with tempfile.TemporaryDirectory() as tmp:
+    search_client = HTTPClient(max_per_host=4, connect_timeout=1, read_timeout=5)
+    image_search = ImageSearch(ImageCache(os.path.join(tmp, "image_cache.db")), search_client, api_url=URL)
+    StubHandler.reset()
+    for player_id in range(20):
+        image_search.player_image(player_id, f"Player {player_id}")
+    report(StubHandler.connections == 1 and image_search.metrics()["upstream_calls"] == 20,
+           f"20 player image lookups made over {StubHandler.connections} connection")
+    image_search.search("Lionel Messi")
+    report(StubHandler.connections <= len(SEARCH_VARIANTS),
+           f"a concurrent name search reuses the pool ({StubHandler.connections} connections in total)")
+    image_search.close()
+
+server.shutdown()
+if failures:
+    print(f"\n❌ {failures} HTTP client checks failed")
+    sys.exit(1)
+print("\n✅ Pooled HTTP client reuses connections and enforces its limits and timeouts")
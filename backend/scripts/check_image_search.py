@@ -0,0 +1,220 @@
+import json
+import multiprocessing
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Make the backend modules importable when run from any directory
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from http_client import HTTPClient
+from image_search import ImageCache, ImageSearch, SEARCH_VARIANTS
+
+TIMEOUT = 0.5  # search deadline for these checks, seconds
+SLOW = 2.0  # how long a hanging variant takes to answer
+HERD = 20  # concurrent callers in the single-flight checks
+WORKERS = 4  # processes sharing the cache file in the cross-worker checks
+
+# query -> (delay in seconds, HTTP status, image URL or None); anything else answers at once with no image
+RESPONSES = {}
+CALLS = []
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Local stand-in for the image API, answering each query as RESPONSES says"""
+
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query).get("q", [""])[0]
+        CALLS.append(query)
+        delay, status, image_url = RESPONSES.get(query, (0, 200, None))
+        time.sleep(delay)
+        body = json.dumps({"Image": image_url} if image_url else {}).encode()
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except OSError:
+            pass  # client gave up (timeout)
+
+
+server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+server.daemon_threads = True
+threading.Thread(target=server.serve_forever, daemon=True).start()
+URL = f"http://127.0.0.1:{server.server_port}/"
+failures = 0
+
+
+def report(ok, message):
+    global failures
+    if not ok:
+        failures += 1
+    print(f"{'✅' if ok else '❌'} {message}")
+
+
+def variants(name, *behaviours):
+    """Script the stub's answer for each SEARCH_VARIANTS query of a name, most preferred first"""
+    for variant, behaviour in zip(SEARCH_VARIANTS, behaviours):
+        RESPONSES[f"{name} {variant}"] = behaviour
+
+
+def search(name):
+    start = time.perf_counter()
+    result = image_search.search(name)
+    return result, time.perf_counter() - start
+
+
+def herd(fn):
+    """Run fn from HERD threads released together; return (results or exceptions, elapsed seconds)"""
+    barrier = threading.Barrier(HERD)
+
+    def call(_):
+        barrier.wait()
+        try:
+            return fn()
+        except Exception as e:
+            return e
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=HERD) as executor:
+        results = list(executor.map(call, range(HERD)))
+    return results, time.perf_counter() - start
+
+
+def worker_lookup(barrier, results, lookup):
+    """One simulated gunicorn worker: its own ImageSearch on the shared cache file, one lookup"""
+    worker_search = ImageSearch(ImageCache(cache.path), HTTPClient(max_per_host=10, connect_timeout=1, read_timeout=5),
+                                api_url=URL, search_timeout=TIMEOUT)
+    barrier.wait()
+    results.put((lookup(worker_search), worker_search.metrics()["coalesced_remote"]))
+    worker_search.close()
+
+
+def worker_herd(lookup):
+    """Run lookup(image_search) once in each of WORKERS processes released together; return their results"""
+    context = multiprocessing.get_context("fork")
+    barrier = context.Barrier(WORKERS)
+    results = context.Queue()
+    processes = [context.Process(target=worker_lookup, args=(barrier, results, lookup)) for _ in range(WORKERS)]
+    for process in processes:
+        process.start()
+    answers = [results.get(timeout=10) for _ in processes]
+    for process in processes:
+        process.join()
+    return answers
+
+
+def upstream_calls(prefix):
+    return sum(1 for query in CALLS if query.startswith(prefix))
+
+
+MISS = (0, 200, None)
+FAIL = (0, 500, None)
+HANG = (SLOW, 200, None)
+
+
+def hit(name, delay=0.0):
+    return (delay, 200, f"https://img.example/{name}.png")
+
+
+tmp = tempfile.TemporaryDirectory()
+cache = ImageCache(os.path.join(tmp.name, "image_cache.db"))
+image_search = ImageSearch(cache, HTTPClient(max_per_host=10, connect_timeout=1, read_timeout=5),
+                           api_url=URL, search_timeout=TIMEOUT)
+print(f"Stub server on {URL}, search deadline {TIMEOUT}s, hanging variants answer after {SLOW}s\n")
+
+# 1. All variants miss: one round trip, and the miss is cached
+variants("Nobody", MISS, MISS, MISS, MISS)
+(image_url, query), elapsed = search("Nobody")
+report(image_url is None and query == f"Nobody {SEARCH_VARIANTS[0]}" and elapsed < 0.2,
+       f"all variants miss: no image after {elapsed:.2f}s")
+report(cache.get("name:nobody") == (None, query), "a miss from every variant is cached as 'no image'")
+
+# 2. Preference order wins over arrival order
+variants("Slow Fotmob", hit("fotmob", delay=0.3), hit("football"), hit("soccer"), MISS)
+(image_url, query), elapsed = search("Slow Fotmob")
+report(query == f"Slow Fotmob {SEARCH_VARIANTS[0]}" and 0.25 < elapsed < 0.45,
+       f"a slower preferred hit beats faster ones ({query!r} after {elapsed:.2f}s)")
+
+# 3. A hit returns as soon as everything ahead of it has answered, without waiting on stragglers
+variants("Second Best", FAIL, hit("football"), MISS, HANG)
+(image_url, query), elapsed = search("Second Best")
+report(query == f"Second Best {SEARCH_VARIANTS[1]}" and elapsed < 0.2,
+       f"first good result returns without waiting on a hanging variant ({elapsed:.2f}s)")
+
+# 4. Worst case: every variant hangs, the whole search costs one deadline instead of four timeouts
+variants("Hanging", HANG, HANG, HANG, HANG)
+(image_url, query), elapsed = search("Hanging")
+report(image_url is None and elapsed < TIMEOUT + 0.15,
+       f"every variant hanging: gave up after {elapsed:.2f}s (sequential worst case {len(SEARCH_VARIANTS) * TIMEOUT:.1f}s)")
+report(cache.get("name:hanging") is None, "a search cut off by the deadline is not cached")
+
+# 5. At the deadline, a less preferred image that did arrive is better than nothing, but is not cached
+variants("Last Resort", HANG, MISS, MISS, hit("transfermarkt"))
+(image_url, query), elapsed = search("Last Resort")
+report(query == f"Last Resort {SEARCH_VARIANTS[3]}" and elapsed < TIMEOUT + 0.15,
+       f"deadline falls back to the best image that arrived ({query!r} after {elapsed:.2f}s)")
+report(cache.get("name:last resort") is None, "a deadline fallback is not cached")
+
+# 6. A thundering herd for one key makes a single upstream call and shares its answer
+RESPONSES["Herd Player fotmob"] = hit("herd", delay=0.3)
+before = image_search.metrics()["coalesced"]
+results, elapsed = herd(lambda: image_search.player_image(99, "Herd Player"))
+report(upstream_calls("Herd Player") == 1 and len(set(results)) == 1 and isinstance(results[0], tuple),
+       f"{HERD} concurrent player lookups: {upstream_calls('Herd Player')} upstream call, one shared answer "
+       f"({image_search.metrics()['coalesced'] - before} coalesced, {elapsed:.2f}s)")
+
+variants("Herd Name", hit("fotmob", delay=0.3), MISS, MISS, MISS)
+results, elapsed = herd(lambda: image_search.search("Herd Name"))
+report(upstream_calls("Herd Name") == len(SEARCH_VARIANTS) and len(set(results)) == 1,
+       f"{HERD} concurrent name searches: {upstream_calls('Herd Name')} upstream calls, one per variant")
+
+RESPONSES["Broken Player fotmob"] = (0.3, 500, None)
+results, elapsed = herd(lambda: image_search.player_image(98, "Broken Player"))
+report(upstream_calls("Broken Player") == 1 and all(isinstance(result, Exception) for result in results),
+       f"an upstream failure is shared too: {HERD} callers see the error from 1 upstream call")
+report(image_search.metrics()["in_flight"] == 0, "no lookups left in flight")
+
+# 7. Across worker processes, the lease in the shared cache file keeps it to one upstream call too
+RESPONSES["Worker Player fotmob"] = hit("worker", delay=0.3)
+answers = worker_herd(lambda worker_search: worker_search.player_image(97, "Worker Player"))
+report(upstream_calls("Worker Player") == 1 and len({answer for answer, _ in answers}) == 1
+       and sum(coalesced for _, coalesced in answers) == WORKERS - 1,
+       f"{WORKERS} workers looking up one player: {upstream_calls('Worker Player')} upstream call, "
+       f"{sum(coalesced for _, coalesced in answers)} answered from the holder's cache entry")
+
+variants("Worker Name", hit("fotmob", delay=0.3), MISS, MISS, MISS)
+answers = worker_herd(lambda worker_search: worker_search.search("Worker Name"))
+report(upstream_calls("Worker Name") == len(SEARCH_VARIANTS) and len({answer for answer, _ in answers}) == 1,
+       f"{WORKERS} workers searching one name: {upstream_calls('Worker Name')} upstream calls, one per variant")
+
+report(not cache.lease_held("player:97") and not cache.lease_held("name:worker name"),
+       "leases are released once the holder is done")
+
+metrics = image_search.metrics()
+print(f"\n  searches timed out: {metrics['searches_timed_out']}, variants abandoned: {metrics['variants_abandoned']}, "
+      f"flights: {metrics['flights']}, coalesced: {metrics['coalesced']}")
+image_search.close()
+server.shutdown()
+tmp.cleanup()
+if failures:
+    print(f"\n❌ {failures} image search checks failed")
+    sys.exit(1)
+print("\n✅ Search variants run concurrently, keep their preference order and respect the deadline, "
+      "and concurrent lookups share one upstream call, within a worker and across workers")
@@ -0,0 +1,93 @@
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# Make the backend modules importable when run from any directory
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+
+# The app under test is worker A; worker B below is a second Leaderboards on the same scratch database
+SYNC_INTERVAL = 0.2  # seconds
+tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp.name, 'leaderboard.db')}"
+os.environ["LEADERBOARD_SYNC_INTERVAL"] = str(SYNC_INTERVAL)
+os.environ["STATS_SPILL_PATH"] = os.path.join(tmp.name, "stats_spill.jsonl")
+os.environ["IMAGE_CACHE_PATH"] = os.path.join(tmp.name, "image_cache.db")
+
+from sqlalchemy import insert
+
+import app as worker_a
+from difficulty import DIFFICULTY_POOLS
+from leaderboard import Leaderboards
+from models import db, User
+
+failures = 0
+
+
+def report(ok, message):
+    global failures
+    if not ok:
+        failures += 1
+    print(f"{'✅' if ok else '❌'} {message}")
+
+
+def save_games(games):
+    """Save (user_id, difficulty, score) games through worker A's stats path"""
+    with worker_a.app.app_context():
+        worker_a.insert_game_stats([
+            {"user_id": user_id, "game_id": f"game-{user_id}-{score}", "difficulty": difficulty, "score": score,
+             "hints_used": 0, "hint_penalty": 0, "completed": True, "time_taken": 60, "played_at": datetime.utcnow()}
+            for user_id, difficulty, score in games
+        ])
+
+
+def wait_for(boards, user_id, score, timeout=5.0):
+    """Seconds until boards rank user_id with score, or None if it never happens"""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        ranking = boards.rank_of(user_id)
+        if ranking is not None and ranking[1] == score:
+            return time.perf_counter() - start
+        time.sleep(0.01)
+    return None
+
+
+with worker_a.app.app_context():
+    db.session.execute(insert(User), [{"username": f"user{i}", "password_hash": "x"} for i in range(1, 4)])
+    db.session.commit()
+
+worker_b = Leaderboards(DIFFICULTY_POOLS, rebuild_interval=1.0, sync_interval=SYNC_INTERVAL)
+worker_b.start(worker_a.load_leaderboard_sources, worker_a.load_new_games)
+print(f"Sync every {SYNC_INTERVAL}s; worker B rebuilds every {worker_b.rebuild_interval}s\n")
+
+# 1. A game saved by worker A reaches both workers' boards within about one sync interval
+save_games([(1, "easy", 300)])
+lag_a, lag_b = wait_for(worker_a.leaderboards, 1, 300), wait_for(worker_b, 1, 300)
+report(lag_a is not None and lag_a < SYNC_INTERVAL + 0.3, f"worker A ranks its own game after {lag_a or 0:.2f}s")
+report(lag_b is not None and lag_b < SYNC_INTERVAL + 0.3, f"worker B ranks worker A's game after {lag_b or 0:.2f}s")
+
+# 2. Syncs and rebuilds interleaved with saves never count a game twice
+for _ in range(10):
+    save_games([(2, "hard", 10), (3, "medium", 20)])
+    time.sleep(0.15)
+expected = {1: 300, 2: 100, 3: 200}
+wait_for(worker_b, 3, 200)
+time.sleep(SYNC_INTERVAL * 2)
+for name, boards in (("worker A", worker_a.leaderboards), ("worker B", worker_b)):
+    scores = {user_id: score for _, user_id, score in boards.top(n=10)}
+    report(scores == expected, f"{name} totals match the database after {boards.metrics()['syncs']} syncs "
+                               f"and {boards.metrics()['rebuilds']} rebuilds: {scores}")
+
+# 3. The endpoint says how fresh its boards are
+response = worker_a.app.test_client().get("/leaderboard").get_json()
+age = (datetime.utcnow() - datetime.fromisoformat(response["as_of"])).total_seconds()
+report(age < SYNC_INTERVAL + 0.5, f"/leaderboard reports as_of {response['as_of']} ({age:.2f}s ago)")
+
+tmp.cleanup()
+if failures:
+    print(f"\n❌ {failures} leaderboard sync checks failed")
+    sys.exit(1)
+print("\n✅ Every worker's leaderboards pick up every worker's games within one sync interval")
@@ -0,0 +1,102 @@
+import os
+import sys
+from datetime import datetime
+
+# Make the backend modules importable when run from any directory
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+
+from sqlalchemy import select
+
+from app import create_app
+from migrations import run_migrations
+from models import db, User, GameStats, UserSession, RevokedToken, UserStatsSummary
+
+now = datetime.utcnow()
+
+# (label, statement, index the plan must use or None for any index/primary key, whether an extra sort is a failure)
+HOT_QUERIES = [
+    ("login: user by username",
+     select(User).where(User.username == "alice"), None, False),
+    ("auth: session by token",
+     select(UserSession).where(UserSession.session_token == "token"), None, False),
+    ("auth: user by id",
+     select(User).where(User.id == 1), None, False),
+    ("stats: rollup rows",
+     select(UserStatsSummary).where(UserStatsSummary.user_id == 1), None, False),
+    ("stats: recent games",
+     select(GameStats).where(GameStats.user_id == 1).order_by(GameStats.played_at.desc()).limit(10),
+     "ix_game_stats_user_id_played_at", True),
+    ("sweeper: expired sessions",
+     select(UserSession.id).where(UserSession.expires_at < now).limit(500), "ix_user_sessions_expires_at", False),
+    ("sweeper: expired revocations",
+     select(RevokedToken.id).where(RevokedToken.expires_at < now).limit(500), "ix_revoked_tokens_expires_at", False),
+    ("revocations: reload",
+     select(RevokedToken.token_id).where(RevokedToken.expires_at > now), "ix_revoked_tokens_expires_at", False),
+    ("sessions of a user",
+     select(UserSession.id).where(UserSession.user_id == 1), "ix_user_sessions_user_id", False),
+    ("leaderboard: last week's games",
+     select(GameStats.user_id, GameStats.difficulty, GameStats.score, GameStats.played_at)
+     .where(GameStats.played_at >= now).order_by(GameStats.played_at), "ix_game_stats_played_at", True),
+]
+
+
+def explain(statement):
+    """Return the query plan as a list of lines"""
+    dialect = db.engine.dialect
+    compiled = statement.compile(dialect=dialect)
+    params = {name: value.isoformat(" ") if isinstance(value, datetime) else value
+              for name, value in compiled.params.items()}
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    connection = db.session.connection()
+    if dialect.name == "sqlite":
+        rows = connection.exec_driver_sql("EXPLAIN QUERY PLAN " + str(compiled), params).fetchall()
+        return [row[-1] for row in rows]
+    # Tiny tables make Postgres prefer sequential scans; ask what it would do at scale
+    connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+    return [row[0] for row in connection.exec_driver_sql("EXPLAIN " + str(compiled), params).fetchall()]
+
+
+def check(plan, index, no_sort):
+    """Return a failure reason, or None if the plan uses the expected index"""
+    text = "\n".join(plan)
+    if db.engine.dialect.name == "sqlite":
+        uses_index = any(marker in text for marker in ("USING INDEX", "USING COVERING INDEX",
+                                                       "USING PRIMARY KEY", "USING INTEGER PRIMARY KEY"))
+        sorts = "USE TEMP B-TREE" in text
+    else:
+        uses_index = "Index" in text
+        sorts = any(line.strip().startswith("Sort") or "->  Sort" in line for line in plan)
+    if not uses_index:
+        return "no index used"
+    if index is not None and index not in text:
+        return f"expected {index}"
+    if no_sort and sorts:
+        return "sorts instead of reading the index in order"
+    return None
+
+
+app = create_app()
+failures = 0
+with app.app_context():
+    db.create_all()
+    run_migrations()
+    print(f"Query plans on {db.engine.dialect.name} ({db.engine.url.render_as_string(hide_password=True)})\n")
+    for label, statement, index, no_sort in HOT_QUERIES:
+        plan = explain(statement)
+        db.session.rollback()
+        reason = check(plan, index, no_sort)
+        if reason:
+            failures += 1
+            print(f"❌ {label}: {reason}")
+            for line in plan:
+                print(f"     {line}")
+        else:
+            print(f"✅ {label}")
+
+if failures:
+    print(f"\n❌ {failures} hot queries are not index-backed")
+    sys.exit(1)
+print("\n✅ Every hot query uses an index")
@@ -0,0 +1,90 @@
+import os
+import sys
+import tempfile
+
+# Make the backend modules importable when run from any directory
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from player_store import PlayerStore
+from snapshot import HEADER, SECTION, SnapshotError, _checksum, load_player_store, load_snapshot, write_snapshot
+
+CSV_PATH = os.path.join(BACKEND_DIR, "data", "cleaned_players.csv")
+failures = 0
+
+
+def report(ok, message):
+    global failures
+    if not ok:
+        failures += 1
+    print(f"{'✅' if ok else '❌'} {message}")
+
+
+def reseal(data):
+    """Recompute the checksum of an edited snapshot, as if the damage had been written out deliberately"""
+    fields = list(HEADER.unpack_from(data, 0))
+    payload_start = HEADER.size + SECTION.size * fields[3]
+    fields[5] = 0
+    crc = _checksum(HEADER.pack(*fields), data[HEADER.size:payload_start], data[payload_start:])
+    fields[5] = crc
+    return HEADER.pack(*fields) + data[HEADER.size:]
+
+
+def flip(data, offset):
+    return data[:offset] + bytes([data[offset] ^ 0xFF]) + data[offset + 1:]
+
+
+def rename_section(data, index, name):
+    offset = HEADER.size + index * SECTION.size
+    _, typecode, start, length = SECTION.unpack_from(data, offset)
+    return data[:offset] + SECTION.pack(name, typecode, start, length) + data[offset + SECTION.size:]
+
+
+def resize_section(data, index, extra):
+    offset = HEADER.size + index * SECTION.size
+    name, typecode, start, length = SECTION.unpack_from(data, offset)
+    return data[:offset] + SECTION.pack(name, typecode, start, length + extra) + data[offset + SECTION.size:]
+
+
+store = PlayerStore.from_csv(CSV_PATH)
+with tempfile.TemporaryDirectory() as tmp:
+    good_path = os.path.join(tmp, "players.snapshot")
+    write_snapshot(store, CSV_PATH, good_path)
+    with open(good_path, "rb") as f:
+        good = f.read()
+    loaded = load_snapshot(good_path, CSV_PATH)
+    report(len(loaded) == len(store), f"an intact snapshot loads ({len(loaded)} players)")
+
+    table_entry = HEADER.size + 2 * SECTION.size
+    damaged = [
+        ("empty file", b""),
+        ("truncated header", good[:HEADER.size // 2]),
+        ("truncated payload", good[:len(good) - 100]),
+        ("flipped byte in the header's section count", flip(good, 12)),
+        ("flipped byte in the source digest", flip(good, 20)),
+        ("flipped byte in the section table", flip(good, table_entry + 20)),
+        ("flipped byte in the payload", flip(good, len(good) - 1)),
+        ("missing section, valid checksum", reseal(rename_section(good, 0, b"bogus"))),
+        ("mis-sized section, valid checksum", reseal(resize_section(good, 2, 1))),
+        ("section past the end, valid checksum", reseal(resize_section(good, 2, 1 << 30))),
+    ]
+    for label, data in damaged:
+        path = os.path.join(tmp, "damaged.snapshot")
+        with open(path, "wb") as f:
+            f.write(data)
+        try:
+            load_snapshot(path)
+            report(False, f"{label}: loaded without error")
+            continue
+        except SnapshotError as e:
+            reason = str(e)
+        except Exception as e:
+            report(False, f"{label}: raised {type(e).__name__} instead of SnapshotError: {e}")
+            continue
+        fallback = load_player_store(CSV_PATH, path)
+        report(len(fallback) == len(store), f"{label}: rejected ({reason}), CSV fallback used")
+
+if failures:
+    print(f"\n❌ {failures} snapshot checks failed")
+    sys.exit(1)
+print("\n✅ Damaged snapshots are rejected and fall back to the CSV")
@@ -0,0 +1,95 @@
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+# Make the backend modules importable when run from any directory
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from flask import Flask
+from sqlalchemy import func, insert, select
+
+from models import db, User, GameStats, UserStatsSummary
+from stats_rollup import apply_rollup, rebuild_rollups
+
+# Rebuilds racing the stats writer must leave user_stats_summary equal to a fresh aggregate of game_stats.
+# Pass a scratch database URL to run against PostgreSQL; its tables are dropped at the end.
+USERS = 20
+GAMES = 2000
+REBUILDS = 10
+
+tmp = tempfile.TemporaryDirectory()
+database_url = sys.argv[1] if len(sys.argv) > 1 else f"sqlite:///{os.path.join(tmp.name, 'rollup.db')}"
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+db.init_app(app)
+failures = 0
+
+
+def report(ok, message):
+    global failures
+    if not ok:
+        failures += 1
+    print(f"{'✅' if ok else '❌'} {message}")
+
+
+def write_games(count, batch_size=5):
+    """Save games in small transactions the way insert_game_stats does"""
+    rng = random.Random(0)
+    with app.app_context():
+        for start in range(0, count, batch_size):
+            rows = [{
+                "user_id": rng.randint(1, USERS), "game_id": f"game-{start + i}",
+                "difficulty": rng.choice(("easy", "medium", "hard")), "score": rng.randint(0, 900),
+                "hints_used": rng.randint(0, 3), "hint_penalty": rng.randint(0, 60),
+                "completed": rng.random() < 0.5, "time_taken": rng.randint(30, 600),
+            } for i in range(batch_size)]
+            db.session.execute(insert(GameStats), rows)
+            apply_rollup(rows)
+            db.session.commit()
+
+
+with app.app_context():
+    db.create_all()
+    db.session.execute(insert(User), [{"username": f"user{i}", "password_hash": "x"} for i in range(1, USERS + 1)])
+    db.session.commit()
+
+print(f"Database: {database_url}\n")
+writer = threading.Thread(target=write_games, args=(GAMES,))
+start = time.perf_counter()
+writer.start()
+with app.app_context():
+    rebuilds = 0
+    while writer.is_alive() or rebuilds < REBUILDS:
+        rebuild_rollups(batch_size=50)
+        rebuilds += 1
+        time.sleep(0.05)  # let the writer in; SQLite's busy wait is not fair
+writer.join()
+elapsed = time.perf_counter() - start
+
+with app.app_context():
+    expected = {
+        (row.user_id, row.difficulty): (row.games, row.score)
+        for row in db.session.execute(
+            select(GameStats.user_id, GameStats.difficulty, func.count().label("games"),
+                   func.sum(GameStats.score).label("score")).group_by(GameStats.user_id, GameStats.difficulty)
+        )
+    }
+    actual = {
+        (row.user_id, row.difficulty): (row.games_played, row.total_score)
+        for row in db.session.execute(select(UserStatsSummary)).scalars()
+    }
+    report(sum(games for games, _ in expected.values()) == GAMES, f"{GAMES} games saved while rebuilding")
+    report(actual == expected,
+           f"{rebuilds} rebuilds racing the writer left the rollups matching game_stats "
+           f"({sum(games for games, _ in actual.values())} games counted, {elapsed:.2f}s)")
+    db.drop_all()
+tmp.cleanup()
+
+if failures:
+    print(f"\n❌ {failures} stats rollup checks failed")
+    sys.exit(1)
+print("\n✅ Rollup rebuilds never double-count games saved while they run")
@@ -0,0 +1,45 @@
+import os
+import sys
+
+# Make the backend modules importable when run from any directory
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from data.valid_pairs import VALID_PAIRS as LITERAL_PAIRS
+from player_store import PlayerStore, ValidPairsView
+
+CSV_PATH = os.path.join(BACKEND_DIR, "data", "cleaned_players.csv")
+
+# Compare the generated valid_pairs.py literal against the view derived from the CSV
+derived_pairs = ValidPairsView(PlayerStore.from_csv(CSV_PATH))
+
+literal_keys = set(LITERAL_PAIRS)
+derived_keys = set(derived_pairs)
+
+only_literal = sorted(literal_keys - derived_keys)
+only_derived = sorted(derived_keys - literal_keys)
+name_drift = []
+for key in sorted(literal_keys & derived_keys):
+    missing = set(derived_pairs[key]) - set(LITERAL_PAIRS[key])
+    extra = set(LITERAL_PAIRS[key]) - set(derived_pairs[key])
+    if missing or extra:
+        name_drift.append((key, sorted(missing), sorted(extra)))
+
+print(f"valid_pairs.py: {len(literal_keys)} pairs, cleaned_players.csv: {len(derived_keys)} pairs")
+
+for country, club in only_literal:
+    print(f"  only in valid_pairs.py: ({country}, {club})")
+for country, club in only_derived:
+    print(f"  only in cleaned_players.csv: ({country}, {club})")
+for (country, club), missing, extra in name_drift:
+    if missing:
+        print(f"  ({country}, {club}) missing from valid_pairs.py: {', '.join(missing)}")
+    if extra:
+        print(f"  ({country}, {club}) not in cleaned_players.csv: {', '.join(extra)}")
+
+if only_literal or only_derived or name_drift:
+    print(f"❌ Drift found: {len(only_literal)} + {len(only_derived)} pairs differ, "
+          f"{len(name_drift)} pairs have different players")
+    sys.exit(1)
+
+print("✅ valid_pairs.py matches cleaned_players.csv")
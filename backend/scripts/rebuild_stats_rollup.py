@@ -0,0 +1,26 @@
+import os
+import sys
+import time
+
+# Make the backend modules importable when run from any directory
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+
+from app import create_app
+from models import db, UserStatsSummary
+from stats_rollup import rebuild_rollups
+
+BATCH_SIZE = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+app = create_app()
+with app.app_context():
+    db.create_all()
+    start = time.perf_counter()
+    try:
+        rows = rebuild_rollups(BATCH_SIZE)
+    except Exception as e:
+        print(f"❌ Rebuild failed: {e}")
+        sys.exit(1)
+    print(f"✅ Rebuilt {UserStatsSummary.query.count()} rollups from {rows} game rows "
+          f"in {time.perf_counter() - start:.2f}s (batches of {BATCH_SIZE})")
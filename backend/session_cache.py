@@ -0,0 +1,120 @@
+"""
+Session-token cache for Tiki Taka Toe
+Keeps recently validated session tokens in memory so authenticated requests
+can skip the session and user queries
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+
+class UserSnapshot:
+    """Read-only copy of the User fields authenticated endpoints need"""
+
+    __slots__ = ("id", "username", "email", "created_at", "last_login")
+
+    def __init__(self, id, username, email, created_at, last_login):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.created_at = created_at
+        self.last_login = last_login
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.username, user.email, user.created_at, user.last_login)
+
+    def to_dict(self):
+        """Same shape as User.to_dict()"""
+        return {
+            'id': self.id,
+            'username': self.username,
+            'email': self.email,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'last_login': self.last_login.isoformat() if self.last_login else None
+        }
+
+
+class SessionCache:
+    """Bounded LRU map of session token -> UserSnapshot with per-entry expiry.
+
+    An entry lives for ttl seconds or until its session expires, whichever is
+    sooner. Entries are dropped explicitly on logout; other workers only see
+    a logout once their own entry expires, so ttl bounds how long a revoked
+    token can keep working there. Keep it to a few seconds: long enough to
+    absorb the burst of requests a page load makes, short enough that a
+    logout takes effect everywhere almost at once.
+    """
+
+    def __init__(self, max_entries=10000, ttl=5.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # token -> (monotonic expiry, UserSnapshot), oldest first
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._invalidated = 0
+
+    def configure(self, max_entries, ttl):
+        """Change the limits, dropping every cached entry"""
+        with self._lock:
+            self.max_entries = max_entries
+            self.ttl = ttl
+            self._entries.clear()
+
+    def get(self, token):
+        """Return the cached UserSnapshot for a token, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[token]
+                self._misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self._hits += 1
+            return entry[1]
+
+    def put(self, token, user, session_expires_at):
+        """Cache a snapshot of user until ttl elapses or the session (a UTC datetime) expires"""
+        if self.max_entries <= 0 or self.ttl <= 0:
+            return
+        session_ttl = (session_expires_at - datetime.utcnow()).total_seconds()
+        lifetime = min(self.ttl, session_ttl)
+        if lifetime <= 0:
+            return
+        with self._lock:
+            self._entries[token] = (time.monotonic() + lifetime, UserSnapshot.from_user(user))
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, token):
+        """Drop a token (on logout)"""
+        with self._lock:
+            if self._entries.pop(token, None) is not None:
+                self._invalidated += 1
+
+    def invalidate_user(self, user_id):
+        """Drop every token cached for a user, so their next request sees fresh fields"""
+        with self._lock:
+            tokens = [token for token, (_, user) in self._entries.items() if user.id == user_id]
+            for token in tokens:
+                del self._entries[token]
+            self._invalidated += len(tokens)
+
+    def metrics(self):
+        """Return size, limits and hit/miss counters"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 3) if lookups else None,
+                "invalidated": self._invalidated,
+            }
@@ -0,0 +1,99 @@
+"""
+Expired-session cleanup for Tiki Taka Toe
+A background thread that deletes expired sessions and revoked-token records
+in bounded batches, keeping the cleanup off the login path
+"""
+
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import delete, select
+
+from models import db, UserSession, RevokedToken
+
+
+class SessionSweeper:
+    """Periodically delete expired rows, batch_size rows per transaction.
+
+    Each sweep keeps deleting batches until one comes back short, so a large
+    backlog is cleared in one sweep without ever holding a long write lock.
+    Every worker may run its own sweeper; deleting an already deleted row is
+    a no-op.
+    """
+
+    def __init__(self, app, batch_size=500, interval=300.0):
+        self.app = app
+        self.batch_size = batch_size
+        self.interval = interval
+        self._thread = None
+        self._stop = threading.Event()
+
+        self._lock = threading.Lock()
+        self._sweeps = 0
+        self._deleted = {"sessions": 0, "revoked_tokens": 0}
+        self._last_sweep_seconds = None
+
+    def start(self):
+        """Start the sweeper thread (no-op if already running or disabled)"""
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="session-sweeper", daemon=True)
+        self._thread.start()
+
+    def _delete_expired(self, model):
+        """Delete expired rows of model in batches, returning how many were removed"""
+        now = datetime.utcnow()
+        total = 0
+        while True:
+            expired_ids = select(model.id).where(model.expires_at < now).limit(self.batch_size)
+            deleted = db.session.execute(
+                delete(model).where(model.id.in_(expired_ids)).execution_options(synchronize_session=False)
+            ).rowcount
+            db.session.commit()
+            total += deleted
+            if deleted < self.batch_size:
+                return total
+
+    def sweep(self):
+        """Run one sweep now and return the number of rows deleted per table"""
+        start = time.perf_counter()
+        with self.app.app_context():
+            try:
+                deleted = {
+                    "sessions": self._delete_expired(UserSession),
+                    "revoked_tokens": self._delete_expired(RevokedToken),
+                }
+            except Exception:
+                db.session.rollback()
+                raise
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._sweeps += 1
+            for table, count in deleted.items():
+                self._deleted[table] += count
+            self._last_sweep_seconds = elapsed
+        return deleted
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Error sweeping expired sessions: {e}")
+
+    def stop(self):
+        """Stop the sweeper thread after its current sweep"""
+        self._stop.set()
+
+    def metrics(self):
+        """Return sweep settings and rows deleted so far"""
+        with self._lock:
+            return {
+                "batch_size": self.batch_size,
+                "interval": self.interval,
+                "sweeps": self._sweeps,
+                "sessions_deleted": self._deleted["sessions"],
+                "revoked_tokens_deleted": self._deleted["revoked_tokens"],
+                "last_sweep_ms": round(self._last_sweep_seconds * 1000, 2) if self._last_sweep_seconds is not None else None,
+            }
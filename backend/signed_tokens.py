@@ -0,0 +1,90 @@
+"""
+Signed session tokens for Tiki Taka Toe
+A stateless alternative to database sessions: the token carries the user id
+and expiry and is signed with the app's SECRET_KEY, so validating it is pure
+CPU work
+"""
+
+import secrets
+import threading
+import time
+from datetime import datetime
+from functools import lru_cache
+
+from itsdangerous import BadSignature, URLSafeSerializer
+from sqlalchemy.exc import IntegrityError
+
+from models import db, RevokedToken
+
+SALT = 'tiki-taka-toe-session'
+
+
+@lru_cache(maxsize=4)
+def _serializer(secret_key):
+    return URLSafeSerializer(secret_key, salt=SALT)
+
+
+def is_signed_token(token):
+    """Signed tokens contain '.' separators; database session tokens are alphanumeric"""
+    return '.' in token
+
+
+def issue_token(secret_key, user_id, lifetime):
+    """Return a signed token for user_id that expires after lifetime (a timedelta)"""
+    claims = {
+        'uid': user_id,
+        'exp': int(time.time() + lifetime.total_seconds()),
+        'jti': secrets.token_hex(8),
+    }
+    return _serializer(secret_key).dumps(claims)
+
+
+def verify_token(secret_key, token):
+    """Return the token's claims ({'uid', 'exp', 'jti'}), or None if it is forged or expired"""
+    try:
+        claims = _serializer(secret_key).loads(token)
+    except BadSignature:
+        return None
+    if not isinstance(claims, dict) or claims.get('exp', 0) <= time.time():
+        return None
+    return claims
+
+
+class RevocationList:
+    """Revoked token ids, stored in the database and mirrored in memory.
+
+    Each worker reloads the unexpired revocations at most every
+    refresh_interval seconds, so checking a token normally touches no
+    database. A revocation made on one worker reaches the others within
+    refresh_interval.
+    """
+
+    def __init__(self, refresh_interval=30.0):
+        self.refresh_interval = refresh_interval
+        self._revoked = set()
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def _reload_if_stale(self):
+        now = time.monotonic()
+        if self._loaded_at is not None and now - self._loaded_at < self.refresh_interval:
+            return
+        rows = db.session.query(RevokedToken.token_id).filter(RevokedToken.expires_at > datetime.utcnow()).all()
+        with self._lock:
+            self._revoked = {token_id for (token_id,) in rows}
+            self._loaded_at = now
+
+    def is_revoked(self, claims):
+        """Check a verified token's claims against the revocation list"""
+        self._reload_if_stale()
+        return claims['jti'] in self._revoked
+
+    def revoke(self, claims):
+        """Revoke a verified token until it would have expired anyway"""
+        with self._lock:
+            self._revoked.add(claims['jti'])
+        db.session.add(RevokedToken(token_id=claims['jti'], expires_at=datetime.utcfromtimestamp(claims['exp'])))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()  # Already revoked (e.g. a repeated logout)
@@ -0,0 +1,166 @@
+"""
+Binary dataset snapshot for Tiki Taka Toe
+Writes the PlayerStore arrays to a versioned file that workers memory-map at
+startup, so every worker shares the same pages through the OS page cache
+instead of parsing the CSV itself
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+
+from player_store import PlayerStore
+
+MAGIC = b"TTTSNAP\x00"
+FORMAT_VERSION = 2
+
+# magic, version, byte order (0 little / 1 big), section count,
+# sha256 of the source CSV, crc32 of the whole file (with this field zeroed), payload length
+HEADER = struct.Struct("<8sHHI32sIQ")
+# section name, array typecode, byte offset from file start, byte length
+SECTION = struct.Struct("<16s1sxxxxxxxQQ")
+ALIGNMENT = 8
+
+# (attribute, typecode) of every PlayerStore array written to the snapshot
+ARRAY_SECTIONS = [
+    ("player_ids", "I"),
+    ("id_order", "I"),
+    ("name_blob", "B"),
+    ("name_offsets", "I"),
+    ("player_countries", "H"),
+    ("club_offsets", "I"),
+    ("club_codes", "H"),
+    ("cell_keys", "I"),
+    ("cell_offsets", "I"),
+    ("cell_rows", "I"),
+]
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot is missing, corrupt, stale or from another format version"""
+
+
+def source_digest(csv_path):
+    """Return the sha256 digest of the source CSV the snapshot was built from"""
+    digest = hashlib.sha256()
+    with open(csv_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def _byte_order_flag():
+    return 0 if sys.byteorder == "little" else 1
+
+
+def _checksum(header, table, payload):
+    """crc32 over the header (with its crc field zeroed), the section table and the payload"""
+    return zlib.crc32(payload, zlib.crc32(table, zlib.crc32(header)))
+
+
+def write_snapshot(store, csv_path, snapshot_path):
+    """Serialize a PlayerStore to snapshot_path, tagged with the digest of csv_path"""
+    sections = [
+        ("teams", "B", "\n".join(store.teams).encode("utf-8")),
+        ("countries", "B", "\n".join(store.countries).encode("utf-8")),
+    ]
+    for name, typecode in ARRAY_SECTIONS:
+        value = getattr(store, name)
+        data = bytes(value) if typecode == "B" else array(typecode, value).tobytes()
+        sections.append((name, typecode, data))
+
+    payload_start = HEADER.size + SECTION.size * len(sections)
+    payload = bytearray()
+    table = []
+    for name, typecode, data in sections:
+        payload.extend(b"\x00" * (-(payload_start + len(payload)) % ALIGNMENT))
+        table.append(SECTION.pack(name.encode("ascii"), typecode.encode("ascii"),
+                                  payload_start + len(payload), len(data)))
+        payload.extend(data)
+
+    table = b"".join(table)
+    digest = source_digest(csv_path)
+    crc = _checksum(HEADER.pack(MAGIC, FORMAT_VERSION, _byte_order_flag(), len(sections), digest, 0, len(payload)),
+                    table, payload)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, _byte_order_flag(), len(sections), digest, crc, len(payload))
+
+    # Write to a temp file and rename so running workers never map a half-written file
+    tmp_path = f"{snapshot_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(table)
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, snapshot_path)
+
+
+def load_snapshot(snapshot_path, csv_path=None):
+    """Memory-map a snapshot and return a PlayerStore backed by it.
+
+    Raises SnapshotError if the file is missing, corrupt, from another format
+    version, or (when csv_path is given) built from a different CSV.
+    """
+    try:
+        with open(snapshot_path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError) as e:
+        raise SnapshotError(f"cannot open snapshot: {e}")
+
+    try:
+        return _parse(mm, csv_path)
+    except (KeyError, ValueError, TypeError, struct.error) as e:
+        # e.g. a section table that passes the checksum but is missing or mis-sizes a section
+        raise SnapshotError(f"snapshot is corrupt: {e!r}")
+
+
+def _parse(mm, csv_path):
+    if len(mm) < HEADER.size:
+        raise SnapshotError("snapshot is truncated")
+    magic, version, byte_order, n_sections, digest, crc, payload_len = HEADER.unpack_from(mm, 0)
+    if magic != MAGIC:
+        raise SnapshotError("not a snapshot file")
+    if version != FORMAT_VERSION:
+        raise SnapshotError(f"snapshot format version {version}, expected {FORMAT_VERSION}")
+    if byte_order != _byte_order_flag():
+        raise SnapshotError("snapshot was built on a machine with a different byte order")
+
+    payload_start = HEADER.size + SECTION.size * n_sections
+    if len(mm) != payload_start + payload_len:
+        raise SnapshotError("snapshot is truncated")
+    view = memoryview(mm)
+    header = HEADER.pack(magic, version, byte_order, n_sections, digest, 0, payload_len)
+    if _checksum(header, view[HEADER.size:payload_start], view[payload_start:]) != crc:
+        raise SnapshotError("snapshot checksum mismatch")
+    if csv_path is not None and source_digest(csv_path) != digest:
+        raise SnapshotError("snapshot is stale (source CSV has changed)")
+
+    sections = {}
+    for i in range(n_sections):
+        name, typecode, offset, length = SECTION.unpack_from(mm, HEADER.size + i * SECTION.size)
+        name = name.rstrip(b"\x00").decode("ascii")
+        if offset < payload_start or offset + length > len(mm):
+            raise SnapshotError(f"section {name} lies outside the payload")
+        sections[name] = view[offset:offset + length].cast(typecode.decode("ascii"))
+
+    arrays = {name: sections[name] for name, _ in ARRAY_SECTIONS}
+    return PlayerStore(
+        teams=bytes(sections["teams"]).decode("utf-8").split("\n"),
+        countries=bytes(sections["countries"]).decode("utf-8").split("\n"),
+        **arrays,
+    )
+
+
+def load_player_store(csv_path, snapshot_path):
+    """Load the player store from its snapshot, falling back to the CSV if unusable"""
+    try:
+        store = load_snapshot(snapshot_path, csv_path)
+        print(f"Loaded player snapshot from {snapshot_path}")
+        return store
+    except SnapshotError as e:
+        print(f"Player snapshot unavailable ({e}), loading {csv_path}")
+        return PlayerStore.from_csv(csv_path)
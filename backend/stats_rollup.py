@@ -0,0 +1,99 @@
+"""
+Per-user stats rollup for Tiki Taka Toe
+Keeps UserStatsSummary in step with GameStats so /auth/stats reads a handful
+of precomputed rows instead of aggregating a user's whole history
+"""
+
+from sqlalchemy import case, delete, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, GameStats, UserStatsSummary
+
+COUNTERS = ("games_played", "games_completed", "total_score", "total_hints_used", "total_hint_penalty")
+
+
+def rollup_deltas(rows):
+    """Fold GameStats row dicts into {(user_id, difficulty): summary column values}"""
+    deltas = {}
+    for row in rows:
+        key = (row["user_id"], row["difficulty"])
+        delta = deltas.get(key)
+        if delta is None:
+            delta = deltas[key] = {"user_id": key[0], "difficulty": key[1], "best_time": None,
+                                   **{counter: 0 for counter in COUNTERS}}
+        delta["games_played"] += 1
+        delta["total_score"] += row.get("score") or 0
+        delta["total_hints_used"] += row.get("hints_used") or 0
+        delta["total_hint_penalty"] += row.get("hint_penalty") or 0
+        if row.get("completed"):
+            delta["games_completed"] += 1
+            time_taken = row.get("time_taken")
+            if time_taken is not None and (delta["best_time"] is None or time_taken < delta["best_time"]):
+                delta["best_time"] = time_taken
+    return deltas
+
+
+def _upsert(dialect_name):
+    if dialect_name == "postgresql":
+        return postgresql.insert(UserStatsSummary)
+    if dialect_name == "sqlite":
+        return sqlite.insert(UserStatsSummary)
+    raise NotImplementedError(f"No upsert support for {dialect_name}")
+
+
+def apply_rollup(rows):
+    """Add GameStats row dicts to their users' rollups in the current transaction (the caller commits)"""
+    deltas = rollup_deltas(rows)
+    if not deltas:
+        return
+    summary = UserStatsSummary.__table__.c
+    statement = _upsert(db.session.get_bind().dialect.name)
+    excluded = statement.excluded
+    statement = statement.on_conflict_do_update(
+        index_elements=[summary.user_id, summary.difficulty],
+        set_={
+            **{counter: summary[counter] + excluded[counter] for counter in COUNTERS},
+            "best_time": case(
+                (excluded.best_time.is_(None), summary.best_time),
+                (summary.best_time.is_(None), excluded.best_time),
+                (excluded.best_time < summary.best_time, excluded.best_time),
+                else_=summary.best_time,
+            ),
+        },
+    )
+    db.session.execute(statement, list(deltas.values()))
+
+
+def rebuild_rollups(batch_size=5000):
+    """Recompute every rollup from GameStats, reading raw rows in id-ordered batches.
+
+    Runs in a single transaction, so readers see either the old or the
+    rebuilt rollups. Saving games is held off until it commits: otherwise a
+    game committed after the delete could be both upserted by the stats
+    writer and read by a later batch, and be counted twice. On PostgreSQL
+    game_stats is locked in SHARE mode, which waits for in-flight inserts
+    and blocks new ones but not reads; SQLite already allows one writer at
+    a time, and the delete takes the write lock. Returns the number of
+    GameStats rows read.
+    """
+    columns = [GameStats.id, GameStats.user_id, GameStats.difficulty, GameStats.score, GameStats.hints_used,
+               GameStats.hint_penalty, GameStats.completed, GameStats.time_taken]
+    try:
+        if db.session.get_bind().dialect.name == "postgresql":
+            db.session.execute(text(f"LOCK TABLE {GameStats.__tablename__} IN SHARE MODE"))
+        db.session.execute(delete(UserStatsSummary))
+        last_id, total = 0, 0
+        while True:
+            batch = db.session.execute(
+                select(*columns).where(GameStats.id > last_id).order_by(GameStats.id).limit(batch_size)
+            ).mappings().all()
+            if not batch:
+                break
+            apply_rollup(batch)
+            last_id = batch[-1]["id"]
+            total += len(batch)
+        db.session.commit()
+        return total
+    except Exception:
+        db.session.rollback()
+        raise
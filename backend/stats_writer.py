@@ -0,0 +1,282 @@
+"""
+Write-behind game statistics for Tiki Taka Toe
+Buffers finished-game records in a bounded queue and writes them in bulk from
+a background thread, so completing a grid never waits on a database commit
+"""
+
+import collections
+import fcntl
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy.exc import DataError, DBAPIError, IntegrityError, TimeoutError as PoolTimeoutError
+
+
+def is_transient_error(error):
+    """True for failures worth retrying (connection loss, locks, timeouts), False for rows the database rejects"""
+    if isinstance(error, (IntegrityError, DataError)):
+        return False
+    return isinstance(error, (DBAPIError, PoolTimeoutError))
+
+
+def _encode_row(row):
+    return json.dumps(row, default=lambda value: {"$datetime": value.isoformat()})
+
+
+def _decode_value(value):
+    if set(value) == {"$datetime"}:
+        return datetime.fromisoformat(value["$datetime"])
+    return value
+
+
+class StatsWriter:
+    """Bounded write-behind queue flushed in batches by a background thread.
+
+    write(rows) must insert and commit a list of row dicts; it is always
+    called inside an app context. The queue is flushed every flush_interval
+    seconds, or as soon as batch_size rows are waiting. If the queue is full,
+    submit() writes the row inline instead of dropping it.
+
+    A failed batch is retried one row at a time, and only rows the database
+    rejects (integrity or data errors) are dropped. Rows that fail for any
+    other reason, such as a lost connection, go to a retry buffer of up to
+    max_queue rows and are retried with exponential backoff; while backing
+    off, new rows wait in the queue. Rows beyond that, and anything still
+    unwritten at shutdown, are appended to spill_path and read back once
+    writes succeed again. The spill file is locked while in use, so every
+    worker can share one.
+    """
+
+    def __init__(self, app, write, max_queue=1000, batch_size=100, flush_interval=1.0,
+                 spill_path=None, max_backoff=60.0):
+        self.app = app
+        self.write = write
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path
+        self.max_backoff = max_backoff
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._retry = collections.deque()
+        self._retry_delay = 0.0
+        self._retry_at = 0.0
+        self._flush_lock = threading.RLock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self._stats_lock = threading.Lock()
+        self._queued = 0
+        self._written = 0
+        self._failed = 0
+        self._deferred = 0
+        self._spilled = 0
+        self._written_inline = 0
+        self._flushes = 0
+        self._flush_seconds = 0.0
+        self._max_flush_seconds = 0.0
+        self._last_flush_seconds = None
+
+    def start(self):
+        """Start the background flush thread (no-op if already running)"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="stats-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, row):
+        """Queue a row for writing, writing it inline if the queue is full"""
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            with self._stats_lock:
+                self._written_inline += 1
+            self._write_batch([row])
+            return
+        with self._stats_lock:
+            self._queued += 1
+        if self._queue.qsize() >= self.batch_size:
+            self._wake.set()
+
+    def flush(self, force=False):
+        """Write deferred rows, then everything queued so far, in batches of batch_size.
+
+        Does nothing while backing off after a failure unless force is set.
+        Stops at the first batch that has to be deferred.
+        """
+        with self._flush_lock:
+            if not force and time.monotonic() < self._retry_at:
+                return
+            if not self._write_retries():
+                return
+            self._unspill()
+            if not self._write_retries():
+                return
+            while True:
+                rows = []
+                while len(rows) < self.batch_size:
+                    try:
+                        rows.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if not rows:
+                    return
+                if not self._write_batch(rows):
+                    return
+
+    def _write_retries(self):
+        """Write the retry buffer; return False if the database is still failing"""
+        while True:
+            with self._stats_lock:
+                rows = [self._retry.popleft() for _ in range(min(self.batch_size, len(self._retry)))]
+            if not rows:
+                return True
+            if not self._write_batch(rows):
+                return False
+
+    def _write_batch(self, rows):
+        """Write rows, dropping only those the database rejects; return False if any had to be deferred"""
+        start = time.perf_counter()
+        written, failed, deferred = 0, 0, []
+        with self.app.app_context():
+            try:
+                self.write(rows)
+                written = len(rows)
+            except Exception as e:
+                if is_transient_error(e):
+                    print(f"Error writing {len(rows)} game stats rows, will retry: {e}")
+                    deferred = rows
+                else:
+                    print(f"Error writing {len(rows)} game stats rows, retrying individually: {e}")
+                    for row in rows:
+                        try:
+                            self.write([row])
+                            written += 1
+                        except Exception as row_error:
+                            if is_transient_error(row_error):
+                                deferred.append(row)
+                            else:
+                                failed += 1
+                                print(f"Dropping game stats for game {row.get('game_id')}: {row_error}")
+        elapsed = time.perf_counter() - start
+        with self._stats_lock:
+            self._written += written
+            self._failed += failed
+            self._flushes += 1
+            self._flush_seconds += elapsed
+            self._max_flush_seconds = max(self._max_flush_seconds, elapsed)
+            self._last_flush_seconds = elapsed
+            if not deferred:
+                self._retry_delay = 0.0
+                self._retry_at = 0.0
+                return True
+            self._deferred += len(deferred)
+            self._retry_delay = min(self.max_backoff, max(self.flush_interval, self._retry_delay * 2))
+            self._retry_at = time.monotonic() + self._retry_delay
+            room = max(0, self.max_queue - len(self._retry))
+            self._retry.extend(deferred[:room])
+            overflow = deferred[room:]
+        if overflow:
+            self._spill(overflow)
+        return False
+
+    # === Spill file ===
+    def _spill(self, rows):
+        """Append rows to the spill file; without one they are lost, and counted as failed"""
+        if not self.spill_path:
+            with self._stats_lock:
+                self._failed += len(rows)
+            print(f"Dropping {len(rows)} game stats rows: retry buffer full and no spill file configured")
+            return
+        with open(self.spill_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.write("".join(_encode_row(row) + "\n" for row in rows))
+            f.flush()
+            os.fsync(f.fileno())
+        with self._stats_lock:
+            self._spilled += len(rows)
+        print(f"Spilled {len(rows)} game stats rows to {self.spill_path}")
+
+    def _unspill(self):
+        """Move as many spilled rows as the retry buffer has room for back into it"""
+        if not self.spill_path:
+            return
+        try:
+            if os.path.getsize(self.spill_path) == 0:
+                return
+        except FileNotFoundError:
+            return
+        with open(self.spill_path, "r+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            lines = f.read().splitlines()
+            with self._stats_lock:
+                room = max(0, self.max_queue - len(self._retry))
+            rows = []
+            for line in lines[:room]:
+                try:
+                    rows.append(json.loads(line, object_hook=_decode_value))
+                except ValueError:
+                    print(f"Skipping unreadable line in {self.spill_path}")
+            f.seek(0)
+            f.truncate()
+            f.write("".join(line + "\n" for line in lines[room:]))
+            f.flush()
+            os.fsync(f.fileno())
+        with self._stats_lock:
+            self._retry.extend(rows)
+        print(f"Loaded {len(rows)} spilled game stats rows from {self.spill_path}")
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing game stats: {e}")
+
+    def close(self):
+        """Stop the background thread, write whatever is still queued and spill what cannot be written"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 5)
+        with self._flush_lock:
+            self.flush(force=True)
+            rows = []
+            while True:
+                try:
+                    rows.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            with self._stats_lock:
+                rows.extend(self._retry)
+                self._retry.clear()
+            if rows:
+                self._spill(rows)
+
+    def metrics(self):
+        """Return queue depth, row counters and flush latency"""
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue": self.max_queue,
+                "batch_size": self.batch_size,
+                "queued": self._queued,
+                "written": self._written,
+                "written_inline": self._written_inline,
+                "failed": self._failed,
+                "retry_depth": len(self._retry),
+                "retry_delay": self._retry_delay,
+                "deferred": self._deferred,
+                "spilled": self._spilled,
+                "flushes": self._flushes,
+                "flush_ms_avg": round(self._flush_seconds / self._flushes * 1000, 2) if self._flushes else None,
+                "flush_ms_max": round(self._max_flush_seconds * 1000, 2),
+                "flush_ms_last": round(self._last_flush_seconds * 1000, 2) if self._last_flush_seconds is not None else None,
+            }